@@ -10,6 +10,11 @@ Version: 2.0
 
 import sys
 import os
+
+# The tray icon blocks the main thread natively, which would starve an
+# eventlet/gevent hub: always serve in 'threading' mode
+os.environ['WIFI_SNIFFER_ASYNC_MODE'] = 'threading'
+
 import threading
 import webbrowser
 import time
@@ -33,7 +38,8 @@ except ImportError:
 
 # Import v2 modules
 try:
-    from wifi_sniffer import create_app, socketio, is_socketio_enabled
+    import wifi_sniffer  # socketio is created by create_app(), read it from the module
+    from wifi_sniffer import create_app, is_socketio_enabled
     from wifi_sniffer.config import SERVER_PORT, DOWNLOADS_FOLDER
     from wifi_sniffer.capture import capture_manager
     from wifi_sniffer.ssh import ssh_pool
@@ -41,7 +47,8 @@ except ImportError as e:
     print(f"[ERROR] Import error: {e}")
     # When running as bundled exe, modules are in the same directory
     sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-    from wifi_sniffer import create_app, socketio, is_socketio_enabled
+    import wifi_sniffer
+    from wifi_sniffer import create_app, is_socketio_enabled
     from wifi_sniffer.config import SERVER_PORT, DOWNLOADS_FOLDER
     from wifi_sniffer.capture import capture_manager
     from wifi_sniffer.ssh import ssh_pool
@@ -58,6 +65,13 @@ class WiFiSnifferAppV2:
         self.port = int(os.environ.get('FLASK_PORT', SERVER_PORT))
         self.host = "127.0.0.1"
         
+        # Icons are rendered once; state changes only swap the image
+        self._icons = {}
+        if TRAY_AVAILABLE:
+            for color in ("green", "yellow", "red", "gray"):
+                self._icons[color] = self.create_icon_image(color)
+        self._last_icon_state = None
+        
     def create_icon_image(self, color="green"):
         """Create a simple icon image for the system tray"""
         size = 64
@@ -145,30 +159,21 @@ class WiFiSnifferAppV2:
         os._exit(0)
     
     def update_icon(self):
-        """Update icon based on current status"""
+        """Update icon based on current status (called on capture state changes)"""
         if not self.icon or not TRAY_AVAILABLE:
             return
         
         try:
             status = capture_manager.get_all_status()
             any_running = any(status[band]["running"] for band in ["2G", "5G", "6G"])
+            state = "yellow" if any_running else "green"
             
-            if any_running:
-                self.icon.icon = self.create_icon_image("yellow")
-            else:
-                self.icon.icon = self.create_icon_image("green")
+            if state != self._last_icon_state:
+                self._last_icon_state = state
+                self.icon.icon = self._icons[state]
         except:
             pass
     
-    def status_monitor(self):
-        """Background thread to monitor and update status"""
-        while self.server_running:
-            try:
-                self.update_icon()
-            except:
-                pass
-            time.sleep(3)
-    
     def run_server(self):
         """Run Flask server in background thread"""
         import logging
@@ -179,6 +184,7 @@ class WiFiSnifferAppV2:
         
         try:
             # Check if SocketIO is enabled and use appropriate run method
+            socketio = wifi_sniffer.socketio
             if is_socketio_enabled() and socketio is not None:
                 print("[INFO] Starting server with SocketIO...")
                 socketio.run(
@@ -190,20 +196,44 @@ class WiFiSnifferAppV2:
                     allow_unsafe_werkzeug=True
                 )
             else:
+                # Last resort only: SocketIO failed to initialize in every async mode
                 print("[INFO] Starting server without SocketIO (polling mode)...")
-                self.app.run(
-                    host=self.host,
-                    port=self.port,
-                    debug=False,
-                    use_reloader=False,
-                    threaded=True
-                )
+                self.run_polling_server()
         except Exception as e:
             print(f"[ERROR] Server error: {e}")
             import traceback
             traceback.print_exc()
             self.server_running = False
     
+    def run_polling_server(self):
+        """Serve the Flask app without SocketIO (uvicorn if installed)"""
+        try:
+            import uvicorn
+            from asgiref.wsgi import WsgiToAsgi
+        except ImportError:
+            uvicorn = None
+        
+        if uvicorn is not None:
+            # Requests wait on SSH round-trips; uvicorn keeps accepting
+            # connections while the WSGI app runs in its thread pool
+            print("[INFO] Using uvicorn ASGI server")
+            uvicorn.run(
+                WsgiToAsgi(self.app),
+                host=self.host,
+                port=self.port,
+                log_level='error',
+                workers=1,
+                loop='asyncio'
+            )
+        else:
+            self.app.run(
+                host=self.host,
+                port=self.port,
+                debug=False,
+                use_reloader=False,
+                threaded=True
+            )
+    
     def create_menu(self):
         """Create system tray menu"""
         return pystray.Menu(
@@ -245,17 +275,18 @@ class WiFiSnifferAppV2:
             print("[INFO] System tray enabled. Right-click the icon for options.")
             print("[INFO] The application is now running in the system tray.")
             
-            # Start status monitor
-            monitor_thread = threading.Thread(target=self.status_monitor, daemon=True)
-            monitor_thread.start()
-            
             # Create and run system tray icon
             self.icon = pystray.Icon(
                 "WiFi Sniffer v2",
-                self.create_icon_image("green"),
+                self._icons["green"],
                 "WiFi Sniffer Control Panel v2",
                 self.create_menu()
             )
+            self._last_icon_state = "green"
+            
+            # Swap the icon when capture state changes instead of polling
+            capture_manager.on_state_change(self.update_icon)
+            self.update_icon()
             
             self.icon.run()
         else:
@@ -10,6 +10,11 @@ Version: 3.0
 
 import sys
 import os
+
+# The tray icon blocks the main thread natively, which would starve an
+# eventlet/gevent hub: always serve in 'threading' mode
+os.environ['WIFI_SNIFFER_ASYNC_MODE'] = 'threading'
+
 import threading
 import webbrowser
 import time
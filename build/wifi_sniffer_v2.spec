@@ -53,6 +53,10 @@ a = Analysis(
         'engineio.packet',
         'engineio.payload',
         'engineio.async_drivers',
+        # engineio loads its async driver by name at runtime, so PyInstaller
+        # cannot see it - list every mode _init_socketio() may select
+        'engineio.async_drivers.eventlet',
+        'engineio.async_drivers.threading',
         'socketio',
         'socketio.server',
         'socketio.namespace',
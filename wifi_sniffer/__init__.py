@@ -6,46 +6,186 @@ A Flask-based web application for controlling WiFi packet capture on OpenWrt.
 Version: 2.0
 """
 
+import functools
+import json
+import logging
 import os
 import sys
-from flask import Flask
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Optional
 
-# Global socketio instance (may be None if SocketIO is disabled)
+# Running as a PyInstaller bundle
+_FROZEN = getattr(sys, 'frozen', False)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from flask import Flask, request
+from flask.json.provider import DefaultJSONProvider
+
+from .config import STATUS_FLUSH_DELAY, STATUS_MIN_EMIT_INTERVAL, STATUS_TICK_INTERVAL
+
+log = logging.getLogger('wifi_sniffer')
+
+# Global socketio instance (may be None if SocketIO is disabled); kept
+# for external readers - internal code uses _S (one global lookup)
 socketio = None
-_socketio_enabled = False
-_startup_cleanup_done = False
+_S = SimpleNamespace(sio=None, enabled=False)
+_startup_cleanup_done = threading.Event()
+_startup_cleanup_lock = threading.Lock()
+_capture_manager = None  # resolved lazily by _cm()
 
+# Status broadcast coalescing: callers only set the flag, a single
+# background flusher emits the latest status once per burst
+_pending_status = threading.Event()
+_status_flusher_started = False
+STATUS_BANDS = ("2G", "5G", "6G")  # one status room per band
 
-def create_app():
+# Interfaces/detection state last sent in connection_update; unchanged
+# values are left out of the next payload
+_last_connection_key = None
+
+
+class _SocketIOSerializer:
     """
-    Application factory for creating the Flask app.
+    json-module stand-in for python-socketio packet encoding.
     
-    Returns:
-        Flask application instance
+    Uses orjson when installed; the stdlib fallback encodes datetimes
+    (e.g. capture start_time) as ISO strings like orjson does.
+    """
+    
+    @staticmethod
+    def dumps(obj, **kwargs):
+        # socketio passes separators=...; both encoders emit compact output
+        if orjson is not None:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+        return json.dumps(obj, separators=(',', ':'), default=_json_default)
+    
+    @staticmethod
+    def loads(data, **kwargs):
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+
+class _OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider for jsonify() and request.get_json().
+    
+    Encodes with orjson when installed, falling back to the stdlib. Either
+    way datetimes come out as ISO strings (same as the WebSocket payloads)
+    and keys keep their insertion order.
+    """
+    
+    sort_keys = False
+    compact = True
+    
+    @staticmethod
+    def default(o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+    
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            return super().dumps(obj, **kwargs)
+        # compact=True keeps response() from asking for indent in debug mode
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+    
+    def loads(self, s, **kwargs):
+        if orjson is None:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+    
+    def fragment(self, obj):
+        """
+        Encode obj once for embedding in later dumps() payloads.
+        
+        Returns an orjson.Fragment (written out as-is) when orjson >= 3.9 is
+        installed, otherwise obj itself, which is then encoded every time.
+        """
+        if orjson is None or not hasattr(orjson, 'Fragment'):
+            return obj
+        return orjson.Fragment(orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS))
+
+
+def _json_default(obj):
+    """Encode values the stdlib json module rejects"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _configure_logging():
+    """Attach the console handler for the package logger (once)"""
+    if log.handlers:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+
+
+def _cm():
+    """Return capture_manager, importing it on first use only"""
+    global _capture_manager
+    cm = _capture_manager
+    if cm is None:
+        from .capture import capture_manager as cm
+        _capture_manager = cm
+    return cm
+
+
+@functools.lru_cache(maxsize=1)
+def _resolve_app_folders():
     """
-    global socketio, _socketio_enabled
+    Resolve the template and static folders (once per process).
     
+    Returns:
+        Tuple of (template_folder, static_folder)
+    """
     # Detect if running as PyInstaller bundle
-    if getattr(sys, 'frozen', False):
+    if _FROZEN:
         # Running as bundled exe
         base_dir = sys._MEIPASS
-        print(f"[INFO] Running as bundled exe, base_dir: {base_dir}")
+        log.info("Running as bundled exe, base_dir: %s", base_dir)
     else:
         base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        print(f"[INFO] Running from source, base_dir: {base_dir}")
+        log.info("Running from source, base_dir: %s", base_dir)
     
-    # Setup template and static folders
     template_folder = os.path.join(base_dir, 'templates')
-    static_folder = os.path.join(base_dir, 'wifi_sniffer', 'static')
     
-    # Fallback paths for bundled exe
-    if not os.path.exists(template_folder):
-        template_folder = os.path.join(base_dir, 'templates')
-    if not os.path.exists(static_folder):
-        static_folder = os.path.join(base_dir, 'static')
+    # The bundled exe may place static files at the top level
+    candidates = (
+        os.path.join(base_dir, 'wifi_sniffer', 'static'),
+        os.path.join(base_dir, 'static'),
+    )
+    static_folder = next((path for path in candidates if os.path.exists(path)), candidates[-1])
+    
+    log.info("Template folder: %s", template_folder)
+    log.info("Static folder: %s", static_folder)
+    return template_folder, static_folder
+
+
+def create_app():
+    """
+    Application factory for creating the Flask app.
+    
+    Returns:
+        Flask application instance
+    """
+    global socketio
     
-    print(f"[INFO] Template folder: {template_folder}")
-    print(f"[INFO] Static folder: {static_folder}")
+    _configure_logging()
+    template_folder, static_folder = _resolve_app_folders()
     
     app = Flask(__name__,
                 template_folder=template_folder,
@@ -53,9 +193,11 @@ def create_app():
     
     # Configure app
     app.config['SECRET_KEY'] = 'wifi-sniffer-secret-key'
+    app.json = _OrjsonProvider(app)
     
     # Try to initialize SocketIO with multiple fallback modes
-    socketio, _socketio_enabled = _init_socketio(app)
+    socketio, enabled = _init_socketio(app)
+    _S.sio, _S.enabled = socketio, enabled
     
     # Register blueprints
     from .routes import api_bp, views_bp
@@ -63,150 +205,323 @@ def create_app():
     app.register_blueprint(views_bp)
     
     # Set socketio on capture manager for broadcasting
-    from .capture import capture_manager
-    if _socketio_enabled and socketio:
-        capture_manager.set_socketio(socketio)
+    if _S.enabled:
+        _cm().set_socketio(socketio)
         # Register WebSocket events
         _register_socketio_events()
+        _start_status_flusher()
     else:
-        print("[INFO] SocketIO disabled, using polling mode")
+        log.info("SocketIO disabled, using polling mode")
     
     return app
 
 
 def _init_socketio(app):
     """
-    Try to initialize SocketIO with multiple async modes.
+    Initialize SocketIO with the best available async mode.
     Returns (socketio_instance, enabled_flag)
     """
     from flask_socketio import SocketIO
     
-    # List of async modes to try, in order of preference
-    # 'threading' is most compatible with PyInstaller
-    async_modes = ['threading', 'eventlet', 'gevent', None]
+    # orjson-backed packet encoding that also handles datetimes
+    options = {'json': _SocketIOSerializer}
+    
+    mode = _select_async_mode()
+    try:
+        log.info("Initializing SocketIO with async_mode='%s'...", mode)
+        sio = SocketIO(app, async_mode=mode, cors_allowed_origins="*", **options)
+        log.info("SocketIO initialized with async_mode='%s'", mode)
+        return sio, True
+    except Exception as e:
+        log.warning("async_mode='%s' failed: %s", mode, e)
     
-    for mode in async_modes:
+    if mode != 'threading':
         try:
-            print(f"[INFO] Trying SocketIO with async_mode='{mode}'...")
-            sio = SocketIO()
-            sio.init_app(app, async_mode=mode, cors_allowed_origins="*")
-            print(f"[OK] SocketIO initialized with async_mode='{mode}'")
+            sio = SocketIO(app, async_mode='threading', cors_allowed_origins="*", **options)
+            log.info("SocketIO initialized with async_mode='threading'")
             return sio, True
         except Exception as e:
-            print(f"[WARN] async_mode='{mode}' failed: {e}")
-            continue
+            log.warning("async_mode='threading' failed: %s", e)
     
-    # All modes failed, create a dummy socketio that won't crash
-    print("[WARN] All SocketIO modes failed, creating fallback...")
-    try:
-        sio = SocketIO()
-        # Don't init with app, just return a dummy
-        return sio, False
-    except:
-        return None, False
+    log.warning("SocketIO unavailable, falling back to polling")
+    return None, False
+
+
+def _patched_async_mode() -> Optional[str]:
+    """'eventlet' or 'gevent' if the entry script monkey-patched the stdlib for it"""
+    eventlet = sys.modules.get('eventlet')
+    if eventlet is not None and eventlet.patcher.is_monkey_patched('thread'):
+        return 'eventlet'
+    gevent_monkey = sys.modules.get('gevent.monkey')
+    if gevent_monkey is not None and gevent_monkey.is_module_patched('threading'):
+        return 'gevent'
+    return None
+
+
+def _select_async_mode() -> str:
+    """
+    Pick the SocketIO async mode.
+    
+    The package never monkey-patches on import; an entry script that wants
+    eventlet or gevent patches the stdlib as its first statement (opt-in via
+    WIFI_SNIFFER_ASYNC_MODE), and that mode is used here. Everything else,
+    including frozen builds and the tray app, runs in 'threading' mode.
+    """
+    override = os.environ.get('WIFI_SNIFFER_ASYNC_MODE')
+    patched = _patched_async_mode()
+    if override in ('eventlet', 'gevent') and override != patched:
+        # Unpatched, blocking calls would stall the event loop
+        log.warning("async_mode='%s' requested but the stdlib is not patched for it; "
+                    "using 'threading'", override)
+        return 'threading'
+    return override or patched or 'threading'
 
 
 def _register_socketio_events():
     """Register WebSocket event handlers"""
-    global socketio
-    if not socketio or not _socketio_enabled:
+    sio = _S.sio
+    if not _S.enabled:
         return
     
-    from .capture import capture_manager
+    sio.on_event('connect', _handle_connect)
+    sio.on_event('disconnect', _handle_disconnect)
+    sio.on_event('request_status', _handle_request_status)
+    sio.on_event('subscribe', _handle_subscribe)
+    sio.on_event('request_connection', _handle_request_connection)
+
+
+def _handle_connect():
+    """Handle client connection"""
+    from flask_socketio import emit, join_room
+    
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug('[WebSocket] Client connected: %s', request.sid)
+    # Subscribe to every band by default; 'subscribe' can narrow it
+    for band in STATUS_BANDS:
+        join_room(_band_room(band))
+    # Send initial status to this client (later broadcasts are deltas)
+    emit('status_update', _cm().get_all_status())
+
+
+def _handle_disconnect():
+    """Handle client disconnection"""
+    log.debug('[WebSocket] Client disconnected')
+
+
+def _handle_request_status():
+    """Handle status request from client"""
+    from flask_socketio import emit
+    
+    emit('status_update', _cm().get_all_status())
+
+
+def _handle_subscribe(data=None):
+    """
+    Limit status_update broadcasts to the given bands.
+    
+    Broadcasts are deltas, so each newly joined band is first sent its
+    full status.
+    """
+    from flask_socketio import emit, join_room, leave_room, rooms
+    
+    bands = data.get('bands', []) if isinstance(data, dict) else []
+    joined = set(rooms())
+    for band in STATUS_BANDS:
+        room = _band_room(band)
+        if band in bands:
+            if room not in joined:
+                join_room(room)
+                emit('status_update', {band: _cm().get_status(band)})
+        else:
+            leave_room(room)
+
+
+def _handle_request_connection():
+    """Handle connection test request (SSH work runs as a background task)"""
+    from flask_socketio import emit
     from .ssh import ssh_pool
     
-    @socketio.on('connect')
-    def handle_connect():
-        """Handle client connection"""
-        print('[WebSocket] Client connected')
-        # Send initial status
-        socketio.emit('status_update', capture_manager.get_all_status())
-    
-    @socketio.on('disconnect')
-    def handle_disconnect():
-        """Handle client disconnection"""
-        print('[WebSocket] Client disconnected')
-    
-    @socketio.on('request_status')
-    def handle_request_status():
-        """Handle status request from client"""
-        socketio.emit('status_update', capture_manager.get_all_status())
-    
-    @socketio.on('request_connection')
-    def handle_request_connection():
-        """Handle connection test request"""
-        global _startup_cleanup_done
-        
-        connected = ssh_pool.test_connection()
-        if connected:
-            # Perform startup cleanup on first successful connection
-            if not _startup_cleanup_done:
-                print("[STARTUP] First connection - running cleanup...")
-                capture_manager.cleanup_remote_processes()
-                _startup_cleanup_done = True
-            
-            if not capture_manager.detection_status["detected"]:
-                capture_manager.detect_interfaces()
+    # Answer with the last known state right away; the refresh below
+    # broadcasts the probed result when it completes
+    last_state = ssh_pool.last_connection_state()
+    if last_state is not None:
+        emit('connection_update', {'connected': last_state})
+    
+    _S.sio.start_background_task(_refresh_connection, request.sid)
+
+
+def _refresh_connection(sid: str):
+    """
+    Test the router connection and broadcast the result.
+    
+    Args:
+        sid: Requesting client; it always gets the full payload, other
+             clients only get interfaces/detection status when changed
+    """
+    from .ssh import ssh_pool
+    capture_manager = _cm()
+    
+    connected = ssh_pool.test_connection()
+    if connected:
+        # Perform startup cleanup on first successful connection
+        perform_startup_cleanup()
         
-        socketio.emit('connection_update', {
-            'connected': connected,
-            'interfaces': capture_manager.interfaces,
-            'detection_status': capture_manager.detection_status
-        })
+        if not capture_manager.detection_status["detected"]:
+            capture_manager.detect_interfaces()
+    
+    _S.sio.emit('connection_update', _connection_payload(connected, full=True), to=sid)
+    _S.sio.emit('connection_update', _connection_payload(connected), skip_sid=sid)
+
+
+def _start_status_flusher():
+    """Start the background task that emits coalesced status updates"""
+    global _status_flusher_started
+    if _status_flusher_started or not _S.enabled:
+        return
+    _status_flusher_started = True
+    _S.sio.start_background_task(_status_flusher)
+
+
+def _status_flusher():
+    """
+    Emit one status_update per burst of broadcast_status_update() calls,
+    at most once every STATUS_MIN_EMIT_INTERVAL seconds.
+    
+    While a capture runs it also wakes every STATUS_TICK_INTERVAL seconds,
+    so clients get the ticking duration without polling /api/status.
+    Only changed fields are sent, and nothing when nothing changed.
+    """
+    sio = _S.sio
+    last_emit = 0.0
+    while True:
+        _pending_status.wait(STATUS_TICK_INTERVAL if _cm().any_running() else None)
+        # Let close-together state changes (e.g. start_all) pile up, and
+        # hold further changes back until the rate budget allows an emit
+        since_last = time.monotonic() - last_emit
+        sio.sleep(max(STATUS_FLUSH_DELAY, STATUS_MIN_EMIT_INTERVAL - since_last))
+        _pending_status.clear()
+        last_emit = time.monotonic()
+        try:
+            # Each band goes to its own room, so clients only receive the
+            # bands they subscribed to
+            for band, fields in _cm().get_status_delta().items():
+                sio.emit('status_update', {band: fields}, to=_band_room(band))
+        except Exception as e:
+            log.error("[WebSocket] Broadcast error: %s", e)
+
+
+def _band_room(band: str) -> str:
+    """SocketIO room name for a band's status_update broadcasts"""
+    return f"status:{band}"
 
 
 def broadcast_status_update():
-    """Broadcast capture status update to all connected clients"""
-    global socketio, _socketio_enabled
-    if socketio and _socketio_enabled:
-        from .capture import capture_manager
+    """
+    Schedule a capture status update for all connected clients.
+    
+    Calls within STATUS_FLUSH_DELAY of each other collapse into one emit,
+    and emits are spaced at least STATUS_MIN_EMIT_INTERVAL apart.
+    """
+    if _S.enabled:
+        _pending_status.set()
+
+
+def broadcast_connection_update(connected: bool):
+    """
+    Broadcast connection status update to all connected clients.
+    
+    The payload is built here, but encoding and sending happen on a
+    SocketIO background task so the caller returns immediately.
+    """
+    s = _S
+    if s.enabled:
         try:
-            socketio.emit('status_update', capture_manager.get_all_status())
-        except:
+            s.sio.start_background_task(_emit_quietly, 'connection_update', _connection_payload(connected))
+        except Exception:
             pass
 
 
-def broadcast_connection_update(connected: bool):
-    """Broadcast connection status update to all connected clients"""
-    global socketio, _socketio_enabled
-    if socketio and _socketio_enabled:
-        from .capture import capture_manager
+def broadcast_download_complete(payload: dict):
+    """
+    Tell all connected clients that a background stop/download finished.
+    
+    Args:
+        payload: job_id, band, success, message and path of the finished job
+    """
+    s = _S
+    if s.enabled:
         try:
-            socketio.emit('connection_update', {
-                'connected': connected,
-                'interfaces': capture_manager.interfaces,
-                'detection_status': capture_manager.detection_status
-            })
-        except:
+            s.sio.start_background_task(_emit_quietly, 'download_complete', payload)
+        except Exception:
             pass
 
 
+def _emit_quietly(event: str, payload: dict):
+    """Broadcast an event, logging instead of raising on failure"""
+    try:
+        _S.sio.emit(event, payload)
+    except Exception as e:
+        log.error("[WebSocket] Broadcast error: %s", e)
+
+
+def _connection_payload(connected: bool, full: bool = False) -> dict:
+    """
+    Build a connection_update payload.
+    
+    Args:
+        connected: Router connection state
+        full: Always include interfaces and detection status (direct
+              replies); otherwise they are only included when they differ
+              from the previous broadcast
+    """
+    global _last_connection_key
+    capture_manager = _cm()
+    
+    payload = {'connected': connected}
+    interfaces = dict(capture_manager.interfaces)
+    detected = capture_manager.detection_status["detected"]
+    if not full:
+        key = (tuple(sorted(interfaces.items())), detected)
+        if key == _last_connection_key:
+            return payload
+        _last_connection_key = key
+    
+    payload['interfaces'] = interfaces
+    payload['detection_status'] = {
+        'detected': detected,
+        'detection_method': capture_manager.detection_status["detection_method"],
+        'last_detection': capture_manager.last_detection_str
+    }
+    return payload
+
+
 def is_socketio_enabled():
     """Check if SocketIO is enabled"""
-    return _socketio_enabled
+    return _S.enabled
 
 
 def perform_startup_cleanup():
     """
     Perform startup cleanup on first successful connection.
-    This is called from the API route when connection is established.
+    This is called from the API route and the request_connection
+    WebSocket handler when a connection is established.
     """
-    global _startup_cleanup_done
-    
-    if _startup_cleanup_done:
-        return False  # Already done
+    # Claim the cleanup atomically so concurrent connects run it once
+    with _startup_cleanup_lock:
+        if _startup_cleanup_done.is_set():
+            return False  # Already done
+        _startup_cleanup_done.set()
     
-    from .capture import capture_manager
-    success, msg = capture_manager.cleanup_remote_processes()
-    _startup_cleanup_done = True
-    print(f"[STARTUP] Cleanup completed: {msg}")
+    log.info("[STARTUP] First connection - running cleanup...")
+    success, msg = _cm().cleanup_remote_processes()
+    log.info("[STARTUP] Cleanup completed: %s", msg)
     return success
 
 
 def is_startup_cleanup_done():
-    """Check if startup cleanup has been performed"""
-    return _startup_cleanup_done
+    """Check if startup cleanup has been performed (or is in progress)"""
+    return _startup_cleanup_done.is_set()
 
 
 __all__ = ['create_app', 'socketio', 'broadcast_status_update', 'broadcast_connection_update', 
-           'is_socketio_enabled', 'perform_startup_cleanup', 'is_startup_cleanup_done']
+           'broadcast_download_complete', 'is_socketio_enabled', 'perform_startup_cleanup', 'is_startup_cleanup_done']
@@ -4,25 +4,128 @@ Cache Layer
 Caching for expensive operations to improve performance.
 """
 
+import heapq
+import os
+import json
 import time
 import threading
-from typing import Any, Optional, Callable
+from collections import OrderedDict
+from concurrent.futures import Future
+from types import MappingProxyType
+from typing import Any, Optional, Callable, Protocol, Tuple
 from datetime import datetime
 
-from .config import CONNECTION_CACHE_TTL, INTERFACE_CACHE_TTL
+from .config import CONNECTION_CACHE_TTL, INTERFACE_CACHE_TTL, STATUS_SNAPSHOT_TTL
+
+CACHE_SHARDS = 16  # must be a power of two
+CACHE_EVICT_EVERY = 64  # set() calls between expired-entry sweeps
+CACHE_MAX_ENTRIES = 128  # in-process entries (all shards); least recently used go first beyond this
+DEFAULT_CACHE_TTL = 30  # seconds, for keys without a configured TTL
+TIME_INFO_FRESH = 2  # seconds before cached time info is refreshed in the background
+
+# Cache TTL settings (in seconds) - using config values; read-only view
+_TTL_SETTINGS = MappingProxyType({
+    'connection_status': CONNECTION_CACHE_TTL,  # Default 10s (was 5s)
+    'interface_mapping': INTERFACE_CACHE_TTL,   # Default 300s (5 minutes)
+    'wifi_config': 60,           # WiFi config cache for 1 minute
+    'time_info': 10,             # Time info, served stale after TIME_INFO_FRESH
+    'diagnose': 5,               # /api/diagnose results for 5 seconds
+    'status_payload': STATUS_SNAPSHOT_TTL,  # capture_manager.get_all_status()
+})
+
+
+# Keys stored in the shared backend when WIFI_SNIFFER_CACHE_URL is set.
+# Other keys (e.g. status_payload, which is tied to this process's snapshot)
+# always stay in-process.
+SHARED_CACHE_KEYS = frozenset({'connection_status', 'interface_mapping', 'wifi_config', 'time_info'})
+
+
+class CacheBackend(Protocol):
+    """External store shared by several app workers"""
+    
+    def get(self, key: str) -> Optional[Any]: ...
+    
+    def set(self, key: str, value: Any, ttl: float) -> None: ...
+    
+    def invalidate_many(self, keys) -> None: ...
+
+
+class RedisBackend:
+    """
+    CacheBackend on Redis, so gunicorn/multi-process workers share
+    connection and interface results instead of each probing over SSH.
+    
+    Values are stored as JSON (never pickle, so whoever can write to Redis
+    can't run code here); tuples come back as lists. Redis errors and
+    undecodable values are logged and treated as cache misses.
+    """
+    
+    PREFIX = 'wifi_sniffer:'
+    
+    def __init__(self, url: str):
+        import redis  # optional dependency, only needed for this backend
+        self._client = redis.Redis.from_url(url, socket_timeout=1)
+        self._client.ping()
+    
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            data = self._client.get(self.PREFIX + key)
+        except Exception as e:
+            print(f"[CACHE] Redis get failed: {e}")
+            return None
+        if data is None:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError as e:
+            print(f"[CACHE] Redis value for {key} is not JSON: {e}")
+            return None
+    
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        try:
+            self._client.set(self.PREFIX + key, json.dumps(value), px=max(1, int(ttl * 1000)))
+        except Exception as e:
+            print(f"[CACHE] Redis set failed: {e}")
+    
+    def invalidate_many(self, keys) -> None:
+        names = [self.PREFIX + key for key in keys]
+        if not names:
+            return
+        try:
+            self._client.delete(*names)
+        except Exception as e:
+            print(f"[CACHE] Redis delete failed: {e}")
+
+
+def _create_backend() -> Optional[CacheBackend]:
+    """Create the shared backend named by WIFI_SNIFFER_CACHE_URL, if any"""
+    url = os.environ.get('WIFI_SNIFFER_CACHE_URL')
+    if not url:
+        return None
+    try:
+        backend = RedisBackend(url)
+        print(f"[CACHE] Using shared cache backend: {url}")
+        return backend
+    except Exception as e:
+        print(f"[CACHE] Shared cache backend unavailable ({e}), using in-process cache")
+        return None
 
 
 class CacheEntry:
     """Single cache entry with TTL"""
     
+    __slots__ = ('value', 'expires_at', 'live')
+    
     def __init__(self, value: Any, ttl: float):
         self.value = value
-        self.created_at = time.time()
-        self.ttl = ttl
+        self.expires_at = time.monotonic() + ttl
+        # Cleared (under the shard lock) once the entry is replaced,
+        # invalidated or evicted, which retires per-thread shadow copies
+        self.live = True
     
     def is_valid(self) -> bool:
         """Check if cache entry is still valid"""
-        return time.time() - self.created_at < self.ttl
+        return time.monotonic() < self.expires_at
 
 
 class StatusCache:
@@ -31,38 +134,47 @@ class StatusCache:
     
     Features:
     - TTL-based expiration
+    - Bounded size (LRU eviction past CACHE_MAX_ENTRIES)
     - Thread-safe access
     - Lazy refresh on access
     """
     
-    _instance = None
-    _lock = threading.Lock()
+    __slots__ = (
+        '_shards', '_locks', '_tls',
+        '_exp_heap', '_evict_lock', '_set_count', '_size',
+        '_inflight', '_inflight_lock', '_backend',
+    )
     
-    def __new__(cls):
-        """Singleton pattern"""
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super().__new__(cls)
-                    cls._instance._initialized = False
-        return cls._instance
-    
-    def __init__(self):
-        if self._initialized:
-            return
-            
-        self._cache: dict[str, CacheEntry] = {}
-        self._cache_lock = threading.Lock()
+    def __init__(self, backend: Optional[CacheBackend] = None):
+        # Optional shared store for SHARED_CACHE_KEYS (multi-worker setups)
+        self._backend = backend
+        
+        # Entries are striped over CACHE_SHARDS dict/lock pairs so unrelated
+        # keys (e.g. connection_status vs time_info) don't contend. Each
+        # shard is kept in least-recently-used-first order.
+        self._shards: list = [OrderedDict() for _ in range(CACHE_SHARDS)]
+        self._locks = [threading.Lock() for _ in range(CACHE_SHARDS)]
+        
+        # Per-thread shadow of recent hits: key -> CacheEntry. Replacing,
+        # invalidating or evicting an entry clears its live flag, which
+        # retires every thread's shadow copy without touching it. Each
+        # shadow holds at most CACHE_MAX_ENTRIES entries.
+        self._tls = threading.local()
         
-        # Cache TTL settings (in seconds) - using config values
-        self._ttl_settings = {
-            'connection_status': CONNECTION_CACHE_TTL,  # Default 10s (was 5s)
-            'interface_mapping': INTERFACE_CACHE_TTL,   # Default 300s (5 minutes)
-            'wifi_config': 60,           # WiFi config cache for 1 minute
-            'time_info': 2,              # Time info cache for 2 seconds
-        }
+        # Expiry heap of (expires_at, key) for the periodic sweep in set(),
+        # and the entry count over all shards (both under _evict_lock)
+        self._exp_heap: list = []
+        self._evict_lock = threading.Lock()
+        self._set_count = 0
+        self._size = 0
         
-        self._initialized = True
+        # get_or_compute() calls currently computing a key
+        self._inflight: dict = {}
+        self._inflight_lock = threading.Lock()
+    
+    def _shard(self, key: str) -> int:
+        """Index of the shard holding key"""
+        return hash(key) & (CACHE_SHARDS - 1)
     
     def get(self, key: str) -> Optional[Any]:
         """
@@ -74,11 +186,37 @@ class StatusCache:
         Returns:
             Cached value or None if expired/missing
         """
-        with self._cache_lock:
-            entry = self._cache.get(key)
-            if entry and entry.is_valid():
-                return entry.value
-            return None
+        if self._backend is not None and key in SHARED_CACHE_KEYS:
+            return self._backend.get(key)
+        
+        now = time.monotonic()
+        
+        # Fast path: this thread's shadow copy, no lock
+        local = self._tls.__dict__
+        shadow = local.get(key)
+        if shadow is not None and shadow.live and shadow.expires_at > now:
+            return shadow.value
+        
+        index = self._shard(key)
+        with self._locks[index]:
+            shard = self._shards[index]
+            entry = shard.get(key)
+            if entry is not None:
+                shard.move_to_end(key)
+        if entry is not None and entry.expires_at > now:
+            if key not in local and len(local) >= CACHE_MAX_ENTRIES:
+                self._prune_shadows(local, now)
+            local[key] = entry
+            return entry.value
+        return None
+    
+    @staticmethod
+    def _prune_shadows(local: dict, now: float) -> None:
+        """Make room in a thread's shadow dict: drop retired/expired entries, else all"""
+        for key in [key for key, entry in local.items() if not entry.live or entry.expires_at <= now]:
+            del local[key]
+        if len(local) >= CACHE_MAX_ENTRIES:
+            local.clear()
     
     def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
         """
@@ -90,21 +228,160 @@ class StatusCache:
             ttl: Time-to-live in seconds (uses default if not specified)
         """
         if ttl is None:
-            ttl = self._ttl_settings.get(key, 30)
+            ttl = _TTL_SETTINGS.get(key, DEFAULT_CACHE_TTL)
+        
+        if self._backend is not None and key in SHARED_CACHE_KEYS:
+            self._backend.set(key, value, ttl)
+            return
+        
+        entry = CacheEntry(value, ttl)
+        index = self._shard(key)
+        with self._locks[index]:
+            shard = self._shards[index]
+            old = shard.get(key)
+            shard[key] = entry
+            shard.move_to_end(key)
+            if old is not None:
+                old.live = False
+        
+        with self._evict_lock:
+            heapq.heappush(self._exp_heap, (entry.expires_at, key))
+            self._set_count += 1
+            if old is None:
+                self._size += 1
+            over = self._size > CACHE_MAX_ENTRIES
+            sweep = self._set_count % CACHE_EVICT_EVERY == 0
+        if over:
+            self._evict_lru(index, key)
+        if sweep:
+            self._evict_expired()
+    
+    def _evict_lru(self, index: int, key: str) -> None:
+        """
+        Drop one least-recently-used entry to get back under CACHE_MAX_ENTRIES.
+        
+        Shards only know their own LRU order, so the entry comes from the
+        shard just written (where the cache is growing) unless key is its
+        only entry, in which case the next non-empty shard gives one up.
         
-        with self._cache_lock:
-            self._cache[key] = CacheEntry(value, ttl)
+        Args:
+            index: Shard of the entry just set
+            key: The entry just set, which is never evicted
+        """
+        for offset in range(CACHE_SHARDS):
+            i = (index + offset) & (CACHE_SHARDS - 1)
+            with self._locks[i]:
+                shard = self._shards[i]
+                if not shard:
+                    continue
+                oldest = next(iter(shard))
+                if oldest == key:
+                    continue
+                self._retire(shard.pop(oldest))
+            self._dropped(1)
+            return
+    
+    def _dropped(self, count: int) -> None:
+        """Account for entries removed from the shards"""
+        if count:
+            with self._evict_lock:
+                self._size -= count
+    
+    def _evict_expired(self) -> None:
+        """Drop entries whose TTL has passed (called every CACHE_EVICT_EVERY sets)"""
+        now = time.monotonic()
+        expired = []
+        with self._evict_lock:
+            while self._exp_heap and self._exp_heap[0][0] <= now:
+                expired.append(heapq.heappop(self._exp_heap)[1])
+        
+        removed = 0
+        for key in expired:
+            index = self._shard(key)
+            with self._locks[index]:
+                entry = self._shards[index].get(key)
+                # The key may have been set again since this heap record
+                if entry is not None and entry.expires_at <= now:
+                    del self._shards[index][key]
+                    entry.live = False
+                    removed += 1
+        self._dropped(removed)
+        
+        # Records of replaced or LRU-evicted keys only leave the heap once
+        # their TTL passes; rebuild it from the live entries if they pile up
+        with self._evict_lock:
+            if len(self._exp_heap) > 4 * CACHE_MAX_ENTRIES:
+                live = []
+                for lock, shard in zip(self._locks, self._shards):
+                    with lock:
+                        live.extend((entry.expires_at, key) for key, entry in shard.items())
+                heapq.heapify(live)
+                self._exp_heap = live
     
     def invalidate(self, key: str) -> None:
         """Invalidate a specific cache entry"""
-        with self._cache_lock:
-            if key in self._cache:
-                del self._cache[key]
+        if self._backend is not None and key in SHARED_CACHE_KEYS:
+            self._backend.invalidate_many((key,))
+            return
+        
+        index = self._shard(key)
+        with self._locks[index]:
+            entry = self._shards[index].pop(key, None)
+            self._retire(entry)
+        self._dropped(entry is not None)
+    
+    def invalidate_many(self, keys) -> None:
+        """
+        Invalidate several entries at once.
+        
+        All affected shard locks are held together (in index order), so
+        readers never see some of the keys invalidated and others live.
+        """
+        keys = list(keys)
+        if self._backend is not None:
+            self._backend.invalidate_many([key for key in keys if key in SHARED_CACHE_KEYS])
+            keys = [key for key in keys if key not in SHARED_CACHE_KEYS]
+        
+        by_shard = {}
+        for key in keys:
+            by_shard.setdefault(self._shard(key), []).append(key)
+        
+        removed = 0
+        indexes = sorted(by_shard)
+        for index in indexes:
+            self._locks[index].acquire()
+        try:
+            for index in indexes:
+                for key in by_shard[index]:
+                    entry = self._shards[index].pop(key, None)
+                    self._retire(entry)
+                    removed += entry is not None
+        finally:
+            for index in reversed(indexes):
+                self._locks[index].release()
+        self._dropped(removed)
     
     def invalidate_all(self) -> None:
         """Invalidate all cache entries"""
-        with self._cache_lock:
-            self._cache.clear()
+        if self._backend is not None:
+            self._backend.invalidate_many(SHARED_CACHE_KEYS)
+        
+        removed = 0
+        for lock, shard in zip(self._locks, self._shards):
+            with lock:
+                for entry in shard.values():
+                    entry.live = False
+                removed += len(shard)
+                shard.clear()
+        with self._evict_lock:
+            self._exp_heap.clear()
+            self._size -= removed
+    
+    @staticmethod
+    def _retire(entry: Optional[CacheEntry]) -> None:
+        """Retire per-thread shadow copies of a removed entry (caller holds its shard lock)"""
+        if entry is not None:
+            entry.live = False
     
     def get_or_compute(self, key: str, compute_fn: Callable, ttl: Optional[float] = None) -> Any:
         """
@@ -122,14 +399,38 @@ class StatusCache:
         if cached is not None:
             return cached
         
-        # Compute new value
-        value = compute_fn()
+        # Only one caller computes a missing key; concurrent callers wait
+        # for its result instead of repeating the work (cache stampede)
+        with self._inflight_lock:
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        
+        if not owner:
+            return future.result()
+        
+        try:
+            value = compute_fn()
+        except BaseException as e:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+        
         self.set(key, value, ttl)
+        with self._inflight_lock:
+            self._inflight.pop(key, None)
+        future.set_result(value)
         return value
 
 
-# Global singleton instance
-status_cache = StatusCache()
+# Global shared instance (import this rather than constructing StatusCache)
+status_cache = StatusCache(backend=_create_backend())
 
 
 # Convenience functions for common cache operations
@@ -153,7 +454,25 @@ def set_cached_interface_mapping(mapping: dict) -> None:
     status_cache.set('interface_mapping', mapping)
 
 
+def get_cached_time_info() -> Tuple[Optional[dict], float]:
+    """
+    Get cached time info and its age.
+    
+    Returns:
+        Tuple of (time info or None, seconds since it was fetched)
+    """
+    cached = status_cache.get('time_info')
+    if cached is None:
+        return None, 0.0
+    info, fetched_at = cached
+    return info, time.time() - fetched_at
+
+
+def set_cached_time_info(info: dict) -> None:
+    """Cache time info (wall-clock stamped, so the age holds across workers)"""
+    status_cache.set('time_info', (info, time.time()))
+
+
 def invalidate_connection_cache() -> None:
     """Invalidate connection-related caches"""
-    status_cache.invalidate('connection_status')
-    status_cache.invalidate('interface_mapping')
+    status_cache.invalidate_many(('connection_status', 'interface_mapping'))
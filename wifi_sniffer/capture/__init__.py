@@ -7,8 +7,10 @@ WiFi packet capture management.
 from .manager import (
     CaptureManager,
     capture_manager,
+    get_capture_manager,
     start_capture,
     stop_capture,
+    start_all_captures,
     stop_all_captures,
     get_capture_status
 )
@@ -16,8 +18,10 @@ from .manager import (
 __all__ = [
     'CaptureManager',
     'capture_manager',
+    'get_capture_manager',
     'start_capture',
     'stop_capture',
+    'start_all_captures',
     'stop_all_captures',
     'get_capture_status'
 ]
@@ -4,17 +4,65 @@ Capture Manager
 Manages WiFi packet capture sessions with state tracking.
 """
 
+import itertools
 import os
+import re
+import shlex
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
 from datetime import datetime
-from typing import Dict, Tuple, Optional, Any
+from types import MappingProxyType
+from typing import Dict, List, Tuple, Optional, Any, Mapping
 
 from ..config import (
     DOWNLOADS_FOLDER, DEFAULT_INTERFACES, DEFAULT_UCI_WIFI_MAP,
     MONITOR_INTERVAL, MONITOR_ERROR_THRESHOLD
 )
-from ..ssh import run_ssh_command, download_file_scp
+from ..cache import status_cache
+from ..ssh import run_ssh_command, run_ssh_batch, run_ssh_stream, download_file_scp, download_files
+
+
+_BANDS = ("2G", "5G", "6G")
+
+# UCI radio settings read by interface detection
+_UCI_SHOW_CMD = "uci show wireless | grep -E 'wifi[0-2]\\.(channel|htmode|band|hwmode)'"
+
+# iwconfig output parsing
+_FREQ_RE = re.compile(r'Frequency[:\s]*(\d+\.?\d*)')
+_CHANNEL_RE = re.compile(r'Channel[:\s]+(\d+)', re.IGNORECASE)
+
+# `uci show wireless` lines, e.g. wireless.wifi0.channel='6'
+_UCI_RE = re.compile(r"""^wireless\.(wifi\d)\.(channel|htmode|band|hwmode)=['"]?([^'"\n]*?)['"]?\s*$""", re.M)
+
+
+def _tcpdump_pattern(interface: str) -> str:
+    """
+    Shell-quoted pgrep/pkill -f pattern for the tcpdump on an interface.
+    
+    The [t] bracket keeps the pattern from matching the remote shell whose
+    own command line contains it (scripts must not spell out the literal
+    "tcpdump -i <iface>" either).
+    """
+    return shlex.quote(f"[t]cpdump -i {interface}")
+
+
+# Router clock as space-separated fields: parsed with int() instead of strptime
+_ROUTER_DATE_CMD = "date '+%Y %m %d %H %M %S'"
+
+
+def _parse_router_time(text: str) -> Optional[datetime]:
+    """Parse _ROUTER_DATE_CMD output into a naive local datetime"""
+    try:
+        return datetime(*map(int, text.split()))
+    except (TypeError, ValueError):
+        return None
+
+
+def _pid_path(band: str) -> str:
+    """Remote pidfile written by start_capture for a band's tcpdump"""
+    return f"/tmp/{band}.pid"
 
 
 class CaptureManager:
@@ -26,30 +74,18 @@ class CaptureManager:
     - Auto time sync before capture
     - Interface auto-detection
     - File split support
-    """
-    
-    _instance = None
-    _lock = threading.Lock()
     
-    def __new__(cls):
-        """Singleton pattern"""
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super().__new__(cls)
-                    cls._instance._initialized = False
-        return cls._instance
+    Use the module-level ``capture_manager`` (or get_capture_manager())
+    rather than constructing new instances.
+    """
     
     def __init__(self):
-        if self._initialized:
-            return
-            
-        # Capture status for each band
-        self._status: Dict[str, Dict[str, Any]] = {
-            "2G": {"running": False, "start_time": None, "packets": 0},
-            "5G": {"running": False, "start_time": None, "packets": 0},
-            "6G": {"running": False, "start_time": None, "packets": 0}
-        }
+        # Capture status for each band: an immutable snapshot that readers
+        # use without locking; _update_status() swaps in a new one
+        self._status_snapshot: Mapping[str, Mapping[str, Any]] = MappingProxyType({
+            band: MappingProxyType({"running": False, "start_time": None, "packets": 0})
+            for band in _BANDS
+        })
         
         # Interface mapping (will be auto-detected)
         self.interfaces = dict(DEFAULT_INTERFACES)
@@ -62,6 +98,8 @@ class CaptureManager:
             "detection_method": None,
             "detected_mapping": None
         }
+        # Formatted once per detection so views/API don't strftime per request
+        self.last_detection_str: Optional[str] = None
         
         # File split configuration
         self.file_split_config = {
@@ -82,18 +120,32 @@ class CaptureManager:
             "offset_seconds": None,
             "success": False
         }
+        # last_sync as "%Y-%m-%d %H:%M:%S", set together with it
+        self.last_sync_str: Optional[str] = None
         
         # Last connection error (for main connection status)
         self.last_connection_error = None
         
         # Monitor error tracking (separate from main connection)
         # This prevents transient monitor SSH failures from affecting UI connection status
-        self._monitor_error_count: Dict[str, int] = {"2G": 0, "5G": 0, "6G": 0}
-        self._monitor_last_error: Dict[str, Optional[str]] = {"2G": None, "5G": None, "6G": None}
+        self._monitor_error_count: Dict[str, int] = dict.fromkeys(_BANDS, 0)
+        self._monitor_last_error: Dict[str, Optional[str]] = dict.fromkeys(_BANDS)
+        # Set to stop a band's monitor thread; each capture gets a fresh one so
+        # a monitor left over from the previous capture can never resume
+        self._stop_events: Dict[str, threading.Event] = {b: threading.Event() for b in _BANDS}
+        
+        # Background stop/download jobs (stop_capture_background)
+        self._download_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="download")
+        self._download_job_ids = itertools.count(1)
+        self._stopping: set = set()  # bands with a background stop in flight
         
-        self._status_lock = threading.Lock()
+        self._status_lock = threading.Lock()  # serializes status writers (readers use the snapshot)
+        self._state_version = 0  # bumped with every new status snapshot
+        self._config_lock = threading.Lock()  # channel_config / interface mapping updates
+        self._config_version = 0  # bumped (under _config_lock) with every such update
+        self._last_broadcast: Dict[str, Dict[str, Any]] = {}  # for get_status_delta()
         self._socketio = None  # Will be set by app factory
-        self._initialized = True
+        self._state_listeners = []  # Callbacks fired on capture state changes
     
     def set_socketio(self, socketio):
         """Set SocketIO instance for broadcasting updates"""
@@ -113,48 +165,145 @@ class CaptureManager:
         try:
             print("[CLEANUP] Checking for stale tcpdump processes on OpenWrt...")
             
-            # Kill all tcpdump processes
+            # Kill all tcpdump processes and clean up any stale pcap files
+            # in /tmp, in one round-trip
             kill_cmd = "killall tcpdump 2>/dev/null; echo 'CLEANUP_DONE'"
-            success, stdout, stderr = run_ssh_command(kill_cmd, timeout=10)
+            cleanup_files_cmd = "rm -f /tmp/*.pcap /tmp/*.pcap[0-9]* 2>/dev/null; ls /tmp/*.pcap 2>/dev/null | wc -l"
+            (success, stdout), _ = run_ssh_batch([kill_cmd, cleanup_files_cmd], timeout=15)
             
             if success and "CLEANUP_DONE" in stdout:
-                # Also clean up any stale pcap files in /tmp
-                cleanup_files_cmd = "rm -f /tmp/*.pcap /tmp/*.pcap[0-9]* 2>/dev/null; ls /tmp/*.pcap 2>/dev/null | wc -l"
-                success2, stdout2, stderr2 = run_ssh_command(cleanup_files_cmd, timeout=10)
-                
                 print("[CLEANUP] Stale tcpdump processes killed, temp files cleaned")
                 return True, "Cleanup completed"
             else:
-                print(f"[CLEANUP] Cleanup command returned: {stdout} {stderr}")
-                return False, f"Cleanup failed: {stderr or stdout}"
+                print(f"[CLEANUP] Cleanup command returned: {stdout}")
+                return False, f"Cleanup failed: {stdout or 'Cannot connect to router'}"
                 
         except Exception as e:
             print(f"[CLEANUP] Error during cleanup: {e}")
             return False, f"Cleanup error: {str(e)}"
     
+    def on_state_change(self, callback):
+        """
+        Register a callback fired whenever capture state changes.
+        
+        Args:
+            callback: Callable taking no arguments; runs on the thread that
+                changed the state, so it should return quickly
+        """
+        self._state_listeners.append(callback)
+    
     def _broadcast_status_update(self):
-        """Broadcast capture status update to all connected clients"""
-        if self._socketio:
+        """Notify state listeners and broadcast status to all connected clients (coalesced)"""
+        for callback in list(self._state_listeners):
             try:
-                self._socketio.emit('status_update', self.get_all_status())
+                callback()
             except Exception as e:
-                print(f"[WebSocket] Broadcast error: {e}")
+                print(f"[STATUS] State listener error: {e}")
+        
+        self._schedule_status_emit()
+    
+    def _schedule_status_emit(self):
+        """Mark status dirty for the rate-limited WebSocket emitter"""
+        if self._socketio:
+            from .. import broadcast_status_update
+            broadcast_status_update()
     
     def get_status(self, band: str) -> Dict[str, Any]:
         """Get capture status for a band"""
+        return self._format_status(self._status_snapshot[band])
+    
+    @staticmethod
+    def _format_status(band_status: Mapping[str, Any]) -> Dict[str, Any]:
+        """Copy a band's status snapshot and add its duration"""
+        status = dict(band_status)
+        if status["running"] and status["start_time"]:
+            delta = datetime.now() - status["start_time"]
+            minutes, seconds = divmod(int(delta.total_seconds()), 60)
+            status["duration"] = f"{minutes:02d}:{seconds:02d}"
+        else:
+            status["duration"] = None
+        return status
+    
+    def _update_status(self, band: str, **fields):
+        """Apply field changes to a band and publish a new status snapshot"""
         with self._status_lock:
-            status = self._status[band].copy()
-            if status["running"] and status["start_time"]:
-                delta = datetime.now() - status["start_time"]
-                minutes, seconds = divmod(int(delta.total_seconds()), 60)
-                status["duration"] = f"{minutes:02d}:{seconds:02d}"
-            else:
-                status["duration"] = None
-            return status
+            snapshot = dict(self._status_snapshot)
+            snapshot[band] = MappingProxyType({**snapshot[band], **fields})
+            self._status_snapshot = MappingProxyType(snapshot)
+            self._state_version += 1
+            if fields.get("running") is False:
+                self._stop_events[band].set()
+        status_cache.invalidate('status_payload')
+    
+    @property
+    def state_version(self) -> int:
+        """Counter that changes whenever capture status changes"""
+        return self._state_version
+    
+    @property
+    def config_version(self) -> int:
+        """Counter that changes whenever interfaces, uci_wifi_map, channel_config or detection_status change"""
+        return self._config_version
+    
+    def reset_detection(self):
+        """Mark the interface mapping as undetected (before forcing a re-detection)"""
+        with self._config_lock:
+            self.detection_status["detected"] = False
+            self._config_version += 1
+    
+    def any_running(self) -> bool:
+        """True if a capture is running on any band"""
+        return any(status["running"] for status in self._status_snapshot.values())
+    
+    def running_bands(self) -> List[str]:
+        """Bands with a running capture, in the usual band order"""
+        snapshot = self._status_snapshot
+        return [band for band in _BANDS if snapshot[band]["running"]]
+    
+    def _build_status_snapshot(self) -> Tuple[Mapping, Dict[str, Dict[str, Any]]]:
+        """Format all bands from one snapshot; returns (snapshot, status)"""
+        snapshot = self._status_snapshot
+        return snapshot, {band: self._format_status(status) for band, status in snapshot.items()}
     
     def get_all_status(self) -> Dict[str, Dict[str, Any]]:
-        """Get capture status for all bands"""
-        return {band: self.get_status(band) for band in ["2G", "5G", "6G"]}
+        """
+        Get capture status for all bands.
+        
+        Served from the shared 'status_payload' cache entry, which state
+        changes invalidate and which expires after STATUS_SNAPSHOT_TTL so
+        durations keep ticking. Returns per-band copies.
+        """
+        source, status = status_cache.get_or_compute('status_payload', self._build_status_snapshot)
+        if source is not self._status_snapshot:
+            # Built from a snapshot that has since been replaced; don't serve it
+            source, status = self._build_status_snapshot()
+        return {band: dict(info) for band, info in status.items()}
+    
+    def get_status_delta(self, force: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the status fields that changed since the previous call.
+        
+        Args:
+            force: Return the full status (e.g. for a newly connected client)
+            
+        Returns:
+            Dict of band -> changed fields; empty if nothing changed
+        """
+        status = self.get_all_status()
+        with self._status_lock:
+            last = self._last_broadcast
+            self._last_broadcast = status
+        
+        if force or not last:
+            return status
+        
+        delta = {}
+        for band, info in status.items():
+            previous = last.get(band, {})
+            changed = {k: v for k, v in info.items() if previous.get(k) != v}
+            if changed:
+                delta[band] = changed
+        return delta
     
     def sync_time(self) -> Tuple[bool, str]:
         """Sync OpenWrt system time with local PC time"""
@@ -162,24 +311,25 @@ class CaptureManager:
             pc_time = datetime.now()
             time_str = pc_time.strftime("%Y-%m-%d %H:%M:%S")
             
-            # Get OpenWrt's current time to calculate offset
-            success, stdout, stderr = run_ssh_command("date '+%Y-%m-%d %H:%M:%S'", timeout=10)
+            # Read OpenWrt's current time (for the offset) and set the new
+            # one in a single round-trip; the exit status is date -s's
+            success, stdout, stderr = run_ssh_command(
+                f"{_ROUTER_DATE_CMD}; date -s \"{time_str}\"", timeout=10
+            )
             
-            if success and stdout.strip():
-                try:
-                    openwrt_time_before = datetime.strptime(stdout.strip(), "%Y-%m-%d %H:%M:%S")
+            before = stdout.strip().split('\n', 1)[0] if stdout else ""
+            if before:
+                openwrt_time_before = _parse_router_time(before)
+                if openwrt_time_before is not None:
                     offset = (pc_time - openwrt_time_before).total_seconds()
                     self.time_sync_status["offset_seconds"] = offset
                     print(f"[TIME SYNC] Offset: {offset:.1f} seconds")
-                except Exception as e:
-                    print(f"[TIME SYNC] Could not parse OpenWrt time: {e}")
-            
-            # Set the time on OpenWrt
-            set_cmd = f'date -s "{time_str}"'
-            success, stdout, stderr = run_ssh_command(set_cmd, timeout=10)
+                else:
+                    print(f"[TIME SYNC] Could not parse OpenWrt time: {before!r}")
             
             if success:
                 self.time_sync_status["last_sync"] = pc_time
+                self.last_sync_str = time_str
                 self.time_sync_status["success"] = True
                 return True, f"Time synced: {time_str}"
             else:
@@ -194,37 +344,32 @@ class CaptureManager:
         """Get current time info from both PC and OpenWrt"""
         pc_time = datetime.now()
         
-        success, stdout, stderr = run_ssh_command("date '+%Y-%m-%d %H:%M:%S'", timeout=10)
+        success, stdout, stderr = run_ssh_command(_ROUTER_DATE_CMD, timeout=10)
         
-        openwrt_time = None
+        openwrt_time = _parse_router_time(stdout) if success else None
         offset = None
-        
-        if success and stdout.strip():
-            try:
-                openwrt_time = datetime.strptime(stdout.strip(), "%Y-%m-%d %H:%M:%S")
-                offset = (pc_time - openwrt_time).total_seconds()
-            except:
-                pass
+        if openwrt_time is not None:
+            offset = (pc_time - openwrt_time).total_seconds()
         
         return {
             "pc_time": pc_time.strftime("%Y-%m-%d %H:%M:%S"),
-            "openwrt_time": stdout.strip() if success else "Unknown",
+            # str() of a naive, whole-second datetime is "%Y-%m-%d %H:%M:%S"
+            "openwrt_time": str(openwrt_time) if openwrt_time is not None else "Unknown",
             "offset_seconds": offset,
             "synced": abs(offset) < 2 if offset is not None else False
         }
     
     def detect_interfaces(self) -> bool:
         """Auto-detect interface mapping from OpenWrt"""
-        import re
-        
         print("[DETECT] Starting interface auto-detection...")
         
         try:
-            # Method 1: Use iwconfig to get frequency
-            success, stdout, stderr = run_ssh_command(
+            # Method 1: Use iwconfig to get frequency. The UCI radio settings
+            # needed on success come back in the same round-trip.
+            (success, stdout), (_, uci_output) = run_ssh_batch([
                 "iwconfig 2>/dev/null | grep -E '^ath[0-2]|Frequency'",
-                timeout=10
-            )
+                _UCI_SHOW_CMD,
+            ], timeout=15)
             
             if success and stdout.strip():
                 detected = {}
@@ -236,7 +381,7 @@ class CaptureManager:
                     if line.startswith('ath'):
                         current_iface = line.split()[0]
                     elif 'Frequency' in line and current_iface:
-                        freq_match = re.search(r'Frequency[:\s]*(\d+\.?\d*)', line)
+                        freq_match = _FREQ_RE.search(line)
                         if freq_match:
                             freq = float(freq_match.group(1))
                             if freq < 3:
@@ -253,15 +398,18 @@ class CaptureManager:
                         new_interfaces[band] = iface
                     
                     if "2G" in new_interfaces and "5G" in new_interfaces and "6G" in new_interfaces:
-                        self.interfaces = new_interfaces
-                        self.detection_status["detected"] = True
-                        self.detection_status["last_detection"] = datetime.now()
-                        self.detection_status["detection_method"] = "iwconfig_frequency"
-                        self.detection_status["detected_mapping"] = dict(self.interfaces)
+                        with self._config_lock:
+                            self.interfaces = new_interfaces
+                            self.detection_status["detected"] = True
+                            self.detection_status["last_detection"] = datetime.now()
+                            self.last_detection_str = self.detection_status["last_detection"].strftime("%Y-%m-%d %H:%M:%S")
+                            self.detection_status["detection_method"] = "iwconfig_frequency"
+                            self.detection_status["detected_mapping"] = dict(self.interfaces)
+                            self._config_version += 1
                         print(f"[DETECT] Success! Mapping: {self.interfaces}")
                         
                         # Detect UCI radio mapping and sync channel config
-                        self._detect_uci_wifi_mapping()
+                        self._detect_uci_wifi_mapping(uci_output)
                         self.sync_channel_config_from_openwrt()
                         return True
             
@@ -272,29 +420,25 @@ class CaptureManager:
             print(f"[DETECT] Error: {e}")
             return False
     
-    def _detect_uci_wifi_mapping(self):
-        """Detect UCI radio mapping based on channel and read current config"""
+    def _detect_uci_wifi_mapping(self, uci_output: Optional[str] = None):
+        """
+        Detect UCI radio mapping based on channel and read current config.
+        
+        Args:
+            uci_output: Output of _UCI_SHOW_CMD if already fetched; read
+                over SSH when None
+        """
         try:
             # Get channel, htmode and band info from UCI
-            success, stdout, stderr = run_ssh_command(
-                "uci show wireless | grep -E 'wifi[0-2]\\.(channel|htmode|band|hwmode)'",
-                timeout=10
-            )
+            if uci_output is None:
+                success, stdout, stderr = run_ssh_command(_UCI_SHOW_CMD, timeout=10)
+            else:
+                success, stdout = True, uci_output
             
             if success and stdout.strip():
                 uci_data = {}
-                for line in stdout.strip().split('\n'):
-                    if '=' in line:
-                        key, value = line.split('=', 1)
-                        key = key.replace('wireless.', '')
-                        value = value.strip("'\"")
-                        
-                        parts = key.split('.')
-                        if len(parts) == 2:
-                            radio, prop = parts
-                            if radio not in uci_data:
-                                uci_data[radio] = {}
-                            uci_data[radio][prop] = value
+                for radio, prop, value in _UCI_RE.findall(stdout):
+                    uci_data.setdefault(radio, {})[prop] = value
                 
                 print(f"[UCI DETECT] Raw data: {uci_data}")
                 
@@ -313,12 +457,14 @@ class CaptureManager:
                             else:
                                 band = "6G"
                             
-                            self.uci_wifi_map[band] = radio
-                            
-                            # Sync local channel_config with actual OpenWrt settings
-                            self.channel_config[band]["channel"] = channel
-                            if htmode:
-                                self.channel_config[band]["bandwidth"] = htmode
+                            with self._config_lock:
+                                self.uci_wifi_map[band] = radio
+                                
+                                # Sync local channel_config with actual OpenWrt settings
+                                self.channel_config[band]["channel"] = channel
+                                if htmode:
+                                    self.channel_config[band]["bandwidth"] = htmode
+                                self._config_version += 1
                             
                             print(f"[UCI DETECT] {radio} -> {band}: CH{channel} {htmode}")
                     except Exception as e:
@@ -330,6 +476,44 @@ class CaptureManager:
         except Exception as e:
             print(f"[UCI DETECT] Error: {e}")
     
+    def _read_radio_configs(self) -> Dict[str, Tuple[int, str]]:
+        """
+        Read channel/htmode for every mapped radio in a single SSH command.
+        
+        Returns:
+            Dict of band -> (channel, htmode); channel is 0 when unset/auto.
+            Bands whose output could not be read are omitted.
+        """
+        radios = {band: radio for band, radio in self.uci_wifi_map.items() if radio}
+        if not radios:
+            return {}
+        
+        # One line per radio: "<radio>|<channel>|<htmode>"
+        cmd = (
+            f"for r in {' '.join(radios.values())}; do "
+            "echo \"$r|$(uci -q get wireless.$r.channel)|$(uci -q get wireless.$r.htmode)\"; "
+            "done"
+        )
+        success, stdout, stderr = run_ssh_command(cmd, timeout=10)
+        if not success:
+            print(f"[UCI READ] Error: {stderr}")
+            return {}
+        
+        by_radio = {}
+        for line in stdout.splitlines():
+            parts = line.strip().split('|')
+            if len(parts) == 3:
+                by_radio[parts[0]] = (parts[1], parts[2])
+        
+        configs = {}
+        for band, radio in radios.items():
+            if radio not in by_radio:
+                continue
+            channel, htmode = by_radio[radio]
+            channel = int(channel) if channel.isdigit() else 0
+            configs[band] = (channel, htmode or self.channel_config[band]["bandwidth"])
+        return configs
+    
     def sync_channel_config_from_openwrt(self) -> bool:
         """
         Sync local channel_config with actual OpenWrt settings.
@@ -338,28 +522,13 @@ class CaptureManager:
         try:
             print("[CONFIG SYNC] Reading current WiFi config from OpenWrt...")
             
-            for band, uci_radio in self.uci_wifi_map.items():
-                if not uci_radio:
-                    continue
-                    
-                success, stdout, stderr = run_ssh_command(
-                    f"uci get wireless.{uci_radio}.channel 2>/dev/null; uci get wireless.{uci_radio}.htmode 2>/dev/null",
-                    timeout=10
-                )
-                
-                if success and stdout.strip():
-                    lines = stdout.strip().split('\n')
-                    if len(lines) >= 1:
-                        try:
-                            channel = int(lines[0]) if lines[0].isdigit() else 0
-                            htmode = lines[1] if len(lines) > 1 else self.channel_config[band]["bandwidth"]
-                            
-                            if channel > 0:
-                                self.channel_config[band]["channel"] = channel
-                                self.channel_config[band]["bandwidth"] = htmode
-                                print(f"[CONFIG SYNC] {band} ({uci_radio}): CH{channel} {htmode}")
-                        except Exception as e:
-                            print(f"[CONFIG SYNC] Parse error for {band}: {e}")
+            for band, (channel, htmode) in self._read_radio_configs().items():
+                if channel > 0:
+                    with self._config_lock:
+                        self.channel_config[band]["channel"] = channel
+                        self.channel_config[band]["bandwidth"] = htmode
+                        self._config_version += 1
+                    print(f"[CONFIG SYNC] {band} ({self.uci_wifi_map[band]}): CH{channel} {htmode}")
             
             print(f"[CONFIG SYNC] Final config: {self.channel_config}")
             return True
@@ -374,15 +543,14 @@ class CaptureManager:
         if not interface:
             return False, f"Unknown band: {band}"
         
-        with self._status_lock:
-            if self._status[band]["running"]:
-                return False, f"{band} capture already running"
+        if self._status_snapshot[band]["running"]:
+            return False, f"{band} capture already running"
         
         try:
             # Auto-sync time before starting capture
             if auto_sync_time:
                 other_bands_running = any(
-                    self._status[b]["running"] for b in ["2G", "5G", "6G"] if b != band
+                    self._status_snapshot[b]["running"] for b in _BANDS if b != band
                 )
                 if not other_bands_running:
                     print(f"[CAPTURE] Syncing time before starting {band} capture...")
@@ -392,20 +560,24 @@ class CaptureManager:
             
             remote_path = f"/tmp/{band}.pcap"
             
-            # Build tcpdump command
+            # Build tcpdump command. The interface goes through $IFACE so the
+            # script's own command line never matches the pgrep/pkill pattern.
             if self.file_split_config["enabled"]:
                 size_mb = self.file_split_config["size_mb"]
-                tcpdump_cmd = f"tcpdump -i {interface} -U -s0 -w {remote_path} -C {size_mb}"
+                tcpdump_cmd = f"tcpdump -i \"$IFACE\" -U -s0 -w {remote_path} -C {size_mb}"
             else:
-                tcpdump_cmd = f"tcpdump -i {interface} -U -s0 -w {remote_path}"
+                tcpdump_cmd = f"tcpdump -i \"$IFACE\" -U -s0 -w {remote_path}"
             
+            # tcpdump's PID goes to a pidfile, so the liveness check is a
+            # kill -0 after a short grace period instead of sleep 1 + pgrep
+            pid_path = _pid_path(band)
             cmd = f"""
-                PID=$(ps | grep "tcpdump -i {interface}" | grep -v grep | awk '{{print $1}}')
-                [ -n "$PID" ] && kill $PID 2>/dev/null
-                rm -f {remote_path} {remote_path}[0-9]* 
-                ({tcpdump_cmd} &)
-                sleep 1
-                ps | grep "tcpdump -i {interface}" | grep -v grep && echo 'TCPDUMP_STARTED' || echo 'TCPDUMP_FAILED'
+                IFACE={shlex.quote(interface)}
+                pkill -f {_tcpdump_pattern(interface)} 2>/dev/null
+                rm -f {remote_path} {remote_path}[0-9]* {pid_path}
+                ({tcpdump_cmd} & echo $! > {pid_path})
+                sleep 0.2
+                kill -0 $(cat {pid_path}) 2>/dev/null && echo 'TCPDUMP_STARTED' || echo 'TCPDUMP_FAILED'
             """
             
             success, stdout, stderr = run_ssh_command(cmd, timeout=15)
@@ -416,13 +588,12 @@ class CaptureManager:
             if "TCPDUMP_STARTED" not in stdout:
                 return False, "tcpdump verification failed"
             
-            with self._status_lock:
-                self._status[band]["running"] = True
-                self._status[band]["start_time"] = datetime.now()
-                self._status[band]["packets"] = 0
+            stop_event = threading.Event()
+            self._stop_events[band] = stop_event
+            self._update_status(band, running=True, start_time=datetime.now(), packets=0)
             
             # Start monitoring thread
-            monitor_thread = threading.Thread(target=self._monitor_capture, args=(band,))
+            monitor_thread = threading.Thread(target=self._monitor_capture, args=(band, stop_event))
             monitor_thread.daemon = True
             monitor_thread.start()
             
@@ -434,56 +605,65 @@ class CaptureManager:
         except Exception as e:
             return False, f"Error starting capture: {str(e)}"
     
-    def _monitor_capture(self, band: str):
+    def _monitor_capture(self, band: str, stop_event: threading.Event):
         """
-        Monitor packet count for a capture.
+        Monitor packet count for a capture until stop_event is set.
+        
+        Runs one long-lived remote loop that prints the pcap size every
+        MONITOR_INTERVAL seconds, instead of an SSH command per poll; the
+        stream is reopened if it drops.
         
         Uses error counting to handle transient SSH failures gracefully.
         Only logs errors after MONITOR_ERROR_THRESHOLD consecutive failures.
         Does NOT affect the main connection status indicator.
         """
-        while self._status[band]["running"]:
+        remote_path = f"/tmp/{band}.pcap"
+        # stat is a single exec (wc -c for busybox builds without stat);
+        # the blank echo keeps the stream alive until the file exists
+        size_loop = (
+            f"while true; do stat -c %s {remote_path} 2>/dev/null "
+            f"|| wc -c 2>/dev/null < {remote_path} || echo; "
+            f"sleep {MONITOR_INTERVAL}; done"
+        )
+        
+        while not stop_event.is_set():
             try:
-                remote_path = f"/tmp/{band}.pcap"
-                success, stdout, stderr = run_ssh_command(
-                    f"ls -la {remote_path} 2>/dev/null | awk '{{print $5}}'",
-                    timeout=8  # Slightly longer timeout for reliability
-                )
-                if success and stdout.strip():
-                    try:
-                        size = int(stdout.strip())
-                        with self._status_lock:
-                            self._status[band]["packets"] = size // 100
+                with closing(run_ssh_stream(size_loop, idle_timeout=MONITOR_INTERVAL * 3)) as lines:
+                    for line in lines:
+                        if stop_event.is_set():
+                            return
+                        try:
+                            size = int(line.strip())
+                        except ValueError:
+                            continue  # File not there yet, keep streaming
+                        self._update_status(band, packets=size // 100)
+                        self._schedule_status_emit()
                         # Reset error count on success
                         self._monitor_error_count[band] = 0
                         self._monitor_last_error[band] = None
-                    except ValueError:
-                        pass  # Ignore parse errors, keep trying
-                else:
-                    # SSH command failed - increment error count
-                    self._monitor_error_count[band] += 1
-                    self._monitor_last_error[band] = stderr or "SSH command failed"
-                    
-                    # Only log after threshold consecutive failures
-                    if self._monitor_error_count[band] == MONITOR_ERROR_THRESHOLD:
-                        print(f"[MONITOR] {band}: SSH errors ({MONITOR_ERROR_THRESHOLD}x), "
-                              f"capture may still be running on OpenWrt")
+                
+                # Stream ended while the capture is still running (connection dropped)
+                self._monitor_error_count[band] += 1
+                self._monitor_last_error[band] = "Monitor stream closed"
+                
+                if self._monitor_error_count[band] == MONITOR_ERROR_THRESHOLD:
+                    print(f"[MONITOR] {band}: SSH errors ({MONITOR_ERROR_THRESHOLD}x), "
+                          f"capture may still be running on OpenWrt")
             except Exception as e:
                 # Exception during SSH - increment error count
                 self._monitor_error_count[band] += 1
-                self._monitor_last_error[band] = str(e)
+                self._monitor_last_error[band] = str(e) or type(e).__name__
                 
                 if self._monitor_error_count[band] == MONITOR_ERROR_THRESHOLD:
                     print(f"[MONITOR] {band}: Monitor exception ({MONITOR_ERROR_THRESHOLD}x): {e}")
             
-            # Use configurable interval (default 5s, was 3s)
-            time.sleep(MONITOR_INTERVAL)
+            # Back off before reopening the stream (returns at once on stop)
+            stop_event.wait(MONITOR_INTERVAL)
     
     def stop_capture(self, band: str) -> Tuple[bool, str, Optional[str]]:
         """Stop packet capture and download file(s)"""
-        with self._status_lock:
-            if not self._status[band]["running"]:
-                return False, f"{band} capture not running", None
+        if not self._status_snapshot[band]["running"]:
+            return False, f"{band} capture not running", None
         
         try:
             interface = self.interfaces.get(band)
@@ -491,7 +671,14 @@ class CaptureManager:
                 return False, f"No interface configured for {band}", None
             
             print(f"[STOP {band}] Stopping tcpdump on {interface}...")
-            kill_cmd = f"PID=$(ps | grep 'tcpdump -i {interface}' | grep -v grep | awk '{{print $1}}'); [ -n \"$PID\" ] && kill $PID 2>/dev/null || true"
+            # Let the monitor go before tcpdump disappears under it
+            self._stop_events[band].set()
+            # pidfile first; pattern match covers captures started without one
+            pid_path = _pid_path(band)
+            kill_cmd = (
+                f"kill $(cat {pid_path} 2>/dev/null) 2>/dev/null; rm -f {pid_path}; "
+                f"pkill -f {_tcpdump_pattern(interface)} 2>/dev/null || true"
+            )
             success, stdout, stderr = run_ssh_command(kill_cmd, timeout=10)
             if not success:
                 print(f"[STOP {band}] Warning: kill command returned error: {stderr}")
@@ -506,16 +693,14 @@ class CaptureManager:
             
             if not success:
                 print(f"[STOP {band}] SSH error checking files: {stderr}")
-                with self._status_lock:
-                    self._status[band]["running"] = False
-                    self._status[band]["start_time"] = None
+                self._update_status(band, running=False, start_time=None)
+                self._broadcast_status_update()
                 return False, f"SSH error: {stderr or 'Connection failed'}", None
             
             if not stdout.strip():
                 print(f"[STOP {band}] No capture files found")
-                with self._status_lock:
-                    self._status[band]["running"] = False
-                    self._status[band]["start_time"] = None
+                self._update_status(band, running=False, start_time=None)
+                self._broadcast_status_update()
                 return False, "No capture file found on router", None
             
             remote_files = [f.strip() for f in stdout.strip().split('\n') if f.strip()]
@@ -543,19 +728,21 @@ class CaptureManager:
                     failed_downloads.append(remote_files[0])
                     print(f"[STOP {band}] Download failed: SCP error")
             else:
-                for i, remote_file in enumerate(remote_files):
-                    part_num = i + 1
-                    local_filename = f"{band}_sniffer_{timestamp}_part{part_num:03d}.pcap"
+                local_filenames = [
+                    f"{band}_sniffer_{timestamp}_part{i + 1:03d}.pcap"
+                    for i in range(len(remote_files))
+                ]
+                print(f"[STOP {band}] Downloading {len(remote_files)} parts...")
+                # All parts share one SFTP session
+                results_ok = download_files([
+                    (remote_file, os.path.join(DOWNLOADS_FOLDER, local_filename))
+                    for remote_file, local_filename in zip(remote_files, local_filenames)
+                ])
+                for remote_file, local_filename, ok in zip(remote_files, local_filenames, results_ok):
                     local_path = os.path.join(DOWNLOADS_FOLDER, local_filename)
-                    
-                    print(f"[STOP {band}] Downloading part {part_num}: {remote_file}...")
-                    if download_file_scp(remote_file, local_path):
-                        if os.path.exists(local_path):
-                            file_size = os.path.getsize(local_path)
-                            total_size += file_size
-                            downloaded_files.append(local_filename)
-                        else:
-                            failed_downloads.append(remote_file)
+                    if ok and os.path.exists(local_path):
+                        total_size += os.path.getsize(local_path)
+                        downloaded_files.append(local_filename)
                     else:
                         failed_downloads.append(remote_file)
             
@@ -563,9 +750,7 @@ class CaptureManager:
             print(f"[STOP {band}] Cleaning up remote files...")
             run_ssh_command(f"rm -f {remote_path}*", timeout=5)
             
-            with self._status_lock:
-                self._status[band]["running"] = False
-                self._status[band]["start_time"] = None
+            self._update_status(band, running=False, start_time=None)
             
             # Broadcast status update via WebSocket
             self._broadcast_status_update()
@@ -594,11 +779,82 @@ class CaptureManager:
                 return False, error_msg, None
         
         except Exception as e:
-            with self._status_lock:
-                self._status[band]["running"] = False
-                self._status[band]["start_time"] = None
+            self._update_status(band, running=False, start_time=None)
+            self._broadcast_status_update()
             return False, f"Error stopping capture: {str(e)}", None
     
+    def stop_capture_background(self, band: str) -> Tuple[bool, str, Optional[int]]:
+        """
+        Stop a capture and download its files on a background thread.
+        
+        The result is broadcast as a 'download_complete' WebSocket event
+        carrying the returned job id.
+        
+        Returns:
+            Tuple of (accepted, message, job_id or None)
+        """
+        if not self._status_snapshot[band]["running"]:
+            return False, f"{band} capture not running", None
+        if not self.interfaces.get(band):
+            return False, f"No interface configured for {band}", None
+        
+        with self._status_lock:
+            if band in self._stopping:
+                return False, f"{band} capture is already stopping", None
+            self._stopping.add(band)
+        
+        job_id = next(self._download_job_ids)
+        future = self._download_executor.submit(self.stop_capture, band)
+        future.add_done_callback(lambda f: self._on_stop_done(job_id, band, f))
+        return True, f"Stopping {band} capture, downloading in background...", job_id
+    
+    def _on_stop_done(self, job_id: int, band: str, future):
+        """Report a finished background stop to WebSocket clients"""
+        with self._status_lock:
+            self._stopping.discard(band)
+        try:
+            success, message, path = future.result()
+        except Exception as e:
+            success, message, path = False, f"Error stopping capture: {e}", None
+        print(f"[STOP {band}] Background job {job_id} finished: {message}")
+        
+        from .. import broadcast_download_complete
+        broadcast_download_complete({
+            "job_id": job_id,
+            "band": band,
+            "success": success,
+            "message": message,
+            "path": path,
+        })
+    
+    def start_all_captures(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Start capture on all bands.
+        
+        Time is synced once up front (if nothing is running yet), then the
+        three bands start concurrently on separate pooled SSH channels.
+        
+        Returns:
+            Dict of band -> {"success", "message"}, in the usual band order
+        """
+        if not self.any_running():
+            print("[START ALL] Syncing time before starting captures...")
+            sync_success, sync_msg = self.sync_time()
+            if sync_success:
+                print("[START ALL] Time sync successful")
+        
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = {
+                band: executor.submit(self.start_capture, band, False)
+                for band in _BANDS
+            }
+            results = {}
+            for band, future in futures.items():
+                success, message = future.result()
+                results[band] = {"success": success, "message": message}
+        
+        return results
+    
     def stop_all_captures(self) -> Dict[str, Dict[str, Any]]:
         """
         Stop all running captures and download pcap files.
@@ -618,14 +874,14 @@ class CaptureManager:
         # Step 1: Always try to kill all tcpdump processes on OpenWrt first
         print("[STOP ALL] Killing all tcpdump processes on OpenWrt...")
         kill_success, kill_stdout, kill_stderr = run_ssh_command(
-            "killall tcpdump 2>/dev/null; echo KILL_DONE",
+            "killall tcpdump 2>/dev/null; rm -f /tmp/[256]G.pid; echo KILL_DONE",
             timeout=15
         )
         
         if not kill_success or "KILL_DONE" not in kill_stdout:
             print(f"[STOP ALL] SSH connection failed: {kill_stderr}")
             # SSH failed - return error for all bands
-            for band in ["2G", "5G", "6G"]:
+            for band in _BANDS:
                 results[band] = {
                     "success": False,
                     "message": f"SSH error: {kill_stderr or 'Cannot connect to router'}",
@@ -639,101 +895,18 @@ class CaptureManager:
         # Step 2: Check for and download pcap files for ALL bands
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
-        for band in ["2G", "5G", "6G"]:
-            remote_path = f"/tmp/{band}.pcap"
-            was_running = self._status[band]["running"]
-            print(f"[STOP ALL] Checking for {band} pcap files (was_running={was_running})...")
-            
-            # Check if pcap files exist
-            check_success, check_stdout, check_stderr = run_ssh_command(
-                f"ls -1 {remote_path}* 2>/dev/null",
-                timeout=10
-            )
-            
-            if not check_success:
-                print(f"[STOP ALL] {band}: SSH error checking files")
-                results[band] = {
-                    "success": False,
-                    "message": "SSH error checking files",
-                    "path": None
-                }
-                # Update local status
-                with self._status_lock:
-                    self._status[band]["running"] = False
-                    self._status[band]["start_time"] = None
-                continue
-            
-            if not check_stdout.strip():
-                print(f"[STOP ALL] {band}: No pcap files found on router")
-                # Always add result - show what we found
-                results[band] = {
-                    "success": False,
-                    "message": "No capture file on router",
-                    "path": None
-                }
-                # Update local status
-                with self._status_lock:
-                    self._status[band]["running"] = False
-                    self._status[band]["start_time"] = None
-                continue
-            
-            # Found pcap files - download them
-            any_files_found = True
-            remote_files = [f.strip() for f in check_stdout.strip().split('\n') if f.strip()]
-            print(f"[STOP ALL] {band}: Found {len(remote_files)} file(s)")
-            
-            downloaded_files = []
-            total_size = 0
-            
-            for i, remote_file in enumerate(remote_files):
-                if len(remote_files) == 1:
-                    local_filename = f"{band}_sniffer_{timestamp}.pcap"
-                else:
-                    local_filename = f"{band}_sniffer_{timestamp}_part{i+1:03d}.pcap"
-                
-                local_path = os.path.join(DOWNLOADS_FOLDER, local_filename)
-                print(f"[STOP ALL] {band}: Downloading {remote_file}...")
-                
-                if download_file_scp(remote_file, local_path):
-                    if os.path.exists(local_path):
-                        file_size = os.path.getsize(local_path)
-                        total_size += file_size
-                        downloaded_files.append(local_filename)
-                        print(f"[STOP ALL] {band}: Downloaded {file_size:,} bytes")
-            
-            # Clean up remote files
-            run_ssh_command(f"rm -f {remote_path}*", timeout=5)
-            
-            # Update local status
-            with self._status_lock:
-                self._status[band]["running"] = False
-                self._status[band]["start_time"] = None
-            
-            # Set result
-            if downloaded_files:
-                if total_size > 1024 * 1024:
-                    size_str = f"{total_size / (1024*1024):.1f} MB"
-                else:
-                    size_str = f"{total_size:,} bytes"
-                
-                if len(downloaded_files) == 1:
-                    results[band] = {
-                        "success": True,
-                        "message": f"Saved: {downloaded_files[0]} ({size_str})",
-                        "path": os.path.join(DOWNLOADS_FOLDER, downloaded_files[0])
-                    }
-                else:
-                    results[band] = {
-                        "success": True,
-                        "message": f"Saved {len(downloaded_files)} files ({size_str})",
-                        "path": DOWNLOADS_FOLDER
-                    }
-            else:
-                results[band] = {
-                    "success": False,
-                    "message": "Download failed",
-                    "path": None
-                }
+        # Bands are independent, so their checks and downloads run
+        # concurrently on separate pooled SSH channels
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = {
+                executor.submit(self._stop_all_band, band, timestamp): band
+                for band in _BANDS
+            }
+            for future in as_completed(futures):
+                results[futures[future]], files_found = future.result()
+                any_files_found = any_files_found or files_found
+        # Keep the usual band order in the response
+        results = {band: results[band] for band in _BANDS}
         
         # Broadcast status update
         self._broadcast_status_update()
@@ -746,18 +919,127 @@ class CaptureManager:
         
         return results
     
+    def _stop_all_band(self, band: str, timestamp: str) -> Tuple[Dict[str, Any], bool]:
+        """
+        Download and clean up one band's pcap files for stop_all_captures().
+        
+        Returns:
+            Tuple of (result dict, whether any files were found)
+        """
+        remote_path = f"/tmp/{band}.pcap"
+        was_running = self._status_snapshot[band]["running"]
+        print(f"[STOP ALL] Checking for {band} pcap files (was_running={was_running})...")
+        
+        # Check if pcap files exist
+        check_success, check_stdout, check_stderr = run_ssh_command(
+            f"ls -1 {remote_path}* 2>/dev/null",
+            timeout=10
+        )
+        
+        if not check_success:
+            print(f"[STOP ALL] {band}: SSH error checking files")
+            result = {
+                "success": False,
+                "message": "SSH error checking files",
+                "path": None
+            }
+            # Update local status
+            self._update_status(band, running=False, start_time=None)
+            return result, False
+        
+        if not check_stdout.strip():
+            print(f"[STOP ALL] {band}: No pcap files found on router")
+            # Always add result - show what we found
+            result = {
+                "success": False,
+                "message": "No capture file on router",
+                "path": None
+            }
+            # Update local status
+            self._update_status(band, running=False, start_time=None)
+            return result, False
+        
+        # Found pcap files - download them
+        remote_files = [f.strip() for f in check_stdout.strip().split('\n') if f.strip()]
+        print(f"[STOP ALL] {band}: Found {len(remote_files)} file(s)")
+        
+        downloaded_files = []
+        total_size = 0
+        
+        if len(remote_files) == 1:
+            local_filenames = [f"{band}_sniffer_{timestamp}.pcap"]
+        else:
+            local_filenames = [
+                f"{band}_sniffer_{timestamp}_part{i + 1:03d}.pcap"
+                for i in range(len(remote_files))
+            ]
+        
+        print(f"[STOP ALL] {band}: Downloading {len(remote_files)} file(s)...")
+        results_ok = download_files([
+            (remote_file, os.path.join(DOWNLOADS_FOLDER, local_filename))
+            for remote_file, local_filename in zip(remote_files, local_filenames)
+        ])
+        for local_filename, ok in zip(local_filenames, results_ok):
+            local_path = os.path.join(DOWNLOADS_FOLDER, local_filename)
+            if ok and os.path.exists(local_path):
+                file_size = os.path.getsize(local_path)
+                total_size += file_size
+                downloaded_files.append(local_filename)
+                print(f"[STOP ALL] {band}: Downloaded {file_size:,} bytes")
+        
+        # Clean up remote files
+        run_ssh_command(f"rm -f {remote_path}*", timeout=5)
+        
+        # Update local status
+        self._update_status(band, running=False, start_time=None)
+        
+        # Set result
+        if downloaded_files:
+            if total_size > 1024 * 1024:
+                size_str = f"{total_size / (1024*1024):.1f} MB"
+            else:
+                size_str = f"{total_size:,} bytes"
+        
+            if len(downloaded_files) == 1:
+                result = {
+                    "success": True,
+                    "message": f"Saved: {downloaded_files[0]} ({size_str})",
+                    "path": os.path.join(DOWNLOADS_FOLDER, downloaded_files[0])
+                }
+            else:
+                result = {
+                    "success": True,
+                    "message": f"Saved {len(downloaded_files)} files ({size_str})",
+                    "path": DOWNLOADS_FOLDER
+                }
+        else:
+            result = {
+                "success": False,
+                "message": "Download failed",
+                "path": None
+            }
+        
+        return result, True
+    
     def set_channel_config(self, band: str, channel: int, bandwidth: str = None) -> Tuple[bool, str]:
         """Set channel configuration for a band"""
-        self.channel_config[band]["channel"] = channel
-        if bandwidth:
-            self.channel_config[band]["bandwidth"] = bandwidth
+        with self._config_lock:
+            self.channel_config[band]["channel"] = channel
+            if bandwidth:
+                self.channel_config[band]["bandwidth"] = bandwidth
+            self._config_version += 1
         return True, f"Config updated for {band}: CH{channel} {bandwidth or ''}"
     
-    def apply_channel_config(self, band: str) -> Tuple[bool, str]:
-        """Apply channel configuration to OpenWrt"""
+    def _uci_channel_commands(self, band: str) -> Tuple[Optional[list], str]:
+        """
+        Build the uci set commands for a band's channel configuration.
+        
+        Returns:
+            Tuple of (commands or None for an unknown band, message)
+        """
         uci_radio = self.uci_wifi_map.get(band)
         if not uci_radio:
-            return False, f"Unknown band: {band}"
+            return None, f"Unknown band: {band}"
         
         channel = self.channel_config[band]["channel"]
         bandwidth = self.channel_config[band]["bandwidth"]
@@ -766,14 +1048,22 @@ class CaptureManager:
             f"uci set wireless.{uci_radio}.channel={channel}",
             f"uci set wireless.{uci_radio}.htmode={bandwidth}",
         ]
+        return commands, f"{band} config set: CH{channel} {bandwidth}"
+    
+    def apply_channel_config(self, band: str) -> Tuple[bool, str]:
+        """Apply channel configuration to OpenWrt (one SSH command)"""
+        commands, msg = self._uci_channel_commands(band)
+        if commands is None:
+            return False, msg
         
-        for cmd in commands:
-            success, stdout, stderr = run_ssh_command(cmd, timeout=10)
-            if not success:
-                return False, f"Failed to execute: {cmd} - {stderr}"
-            print(f"[UCI] {cmd}")
+        cmd = " && ".join(commands)
+        success, stdout, stderr = run_ssh_command(cmd, timeout=10)
+        if not success:
+            return False, f"Failed to execute: {cmd} - {stderr}"
+        for c in commands:
+            print(f"[UCI] {c}")
         
-        return True, f"{band} config set: CH{channel} {bandwidth}"
+        return True, msg
     
     def apply_all_and_restart_wifi(self) -> Dict[str, Any]:
         """
@@ -815,24 +1105,35 @@ class CaptureManager:
         else:
             results["messages"].append(f"Cleanup warning: {cleanup_msg}")
         
-        # Step 2: Apply channel configuration for each band
-        for band in ["2G", "5G", "6G"]:
-            success, msg = self.apply_channel_config(band)
-            results["bands"][band] = {"success": success, "message": msg}
-            results["messages"].append(f"{band}: {msg}")
-            if not success:
+        # Step 2: Build channel configuration for each band
+        uci_commands = []
+        band_messages = {}
+        for band in _BANDS:
+            commands, msg = self._uci_channel_commands(band)
+            band_messages[band] = msg
+            if commands is None:
                 results["success"] = False
+                results["bands"][band] = {"success": False, "message": msg}
+                results["messages"].append(f"{band}: {msg}")
+            else:
+                uci_commands += commands
         
         if not results["success"]:
             return results
         
-        # Step 3: Commit UCI changes
-        success, stdout, stderr = run_ssh_command("uci commit wireless", timeout=10)
+        # Step 3: Set and commit all UCI changes in one SSH round-trip
+        uci_commands.append("uci commit wireless")
+        success, stdout, stderr = run_ssh_command(" && ".join(uci_commands), timeout=15)
+        for band, msg in band_messages.items():
+            results["bands"][band] = {"success": success, "message": msg}
+            results["messages"].append(f"{band}: {msg}")
         if not success:
             results["success"] = False
-            results["messages"].append(f"UCI commit failed: {stderr}")
+            results["messages"].append(f"UCI apply failed: {stderr}")
             return results
         
+        for cmd in uci_commands:
+            print(f"[UCI] {cmd}")
         results["messages"].append("UCI changes committed")
         
         # Step 4: Use robust wifi restart sequence (wifi down; wifi up)
@@ -854,48 +1155,41 @@ class CaptureManager:
         
         results["messages"].append("Wifi restart initiated, waiting for interfaces...")
         
-        # Step 5: Poll for interfaces to be ready
+        # Step 5: Wait for interfaces on the router itself - one SSH command
+        # that returns as soon as all three are up (retried if SSH drops
+        # while wifi restarts)
         max_wait = 90  # Maximum wait time in seconds
         start_time = time.time()
+        deadline = start_time + max_wait
         interfaces_ready = False
-        last_check = ""
         
-        while time.time() - start_time < max_wait:
-            time.sleep(3)  # Check every 3 seconds (more frequent)
-            elapsed = int(time.time() - start_time)
-            
-            success, stdout, stderr = run_ssh_command("iwconfig 2>/dev/null | grep -E '^ath[0-2]'", timeout=10)
-            
-            if success:
-                found_interfaces = []
-                if "ath0" in stdout:
-                    found_interfaces.append("ath0")
-                if "ath1" in stdout:
-                    found_interfaces.append("ath1")
-                if "ath2" in stdout:
-                    found_interfaces.append("ath2")
-                
-                current_check = ",".join(found_interfaces)
-                if current_check != last_check:
-                    print(f"[WIFI] {elapsed}s: Found interfaces: {current_check}")
-                    last_check = current_check
-                
-                if len(found_interfaces) == 3:
-                    interfaces_ready = True
-                    break
-            
-            # Progress update every 15 seconds
-            if elapsed % 15 == 0 and elapsed > 0:
-                print(f"[WIFI] Waiting... {elapsed}s / {max_wait}s")
+        while not interfaces_ready:
+            remaining = int(deadline - time.time())
+            if remaining <= 0:
+                break
+            wait_cmd = (
+                f"i=0; while [ $i -lt {remaining} ]; do "
+                "if [ $(iwconfig 2>/dev/null | grep -cE '^ath[0-2]') -ge 3 ]; then "
+                # Give the interfaces a moment to stabilize before reading them
+                "echo READY; sleep 3; iwconfig 2>/dev/null | grep -E 'Frequency|^ath'; exit 0; "
+                "fi; sleep 1; i=$((i+1)); done; echo TIMEOUT"
+            )
+            success, stdout, stderr = run_ssh_command(wait_cmd, timeout=remaining + 15)
+            
+            if success and stdout.startswith("READY"):
+                interfaces_ready = True
+                print(f"[WIFI] {int(time.time() - start_time)}s: All interfaces up")
+                interface_status = stdout.split("\n", 1)[1] if "\n" in stdout else ""
+            elif success and "TIMEOUT" in stdout:
+                break
+            else:
+                print(f"[WIFI] Waiting for interfaces, SSH error: {stderr}")
+                time.sleep(3)
         
         if interfaces_ready:
             results["messages"].append("All interfaces ready!")
-            # Wait a bit more for interfaces to stabilize
-            time.sleep(3)
-            
-            success, stdout, stderr = run_ssh_command("iwconfig 2>/dev/null | grep -E 'Frequency|^ath'", timeout=10)
-            if success:
-                results["interface_status"] = stdout
+            if interface_status.strip():
+                results["interface_status"] = interface_status
             
             # Re-detect interface mapping after wifi restart
             self.detect_interfaces()
@@ -915,26 +1209,13 @@ class CaptureManager:
         """
         if force_refresh:
             # Query OpenWrt for current config
-            for band, uci_radio in self.uci_wifi_map.items():
-                if not uci_radio:
-                    continue
-                    
-                success, stdout, stderr = run_ssh_command(
-                    f"uci get wireless.{uci_radio}.channel 2>/dev/null; uci get wireless.{uci_radio}.htmode 2>/dev/null",
-                    timeout=10
-                )
-                if success and stdout.strip():
-                    lines = stdout.strip().split('\n')
-                    try:
-                        channel = int(lines[0]) if lines[0].isdigit() else 0
-                        htmode = lines[1] if len(lines) > 1 else self.channel_config[band]["bandwidth"]
-                        
-                        if channel > 0:
-                            self.channel_config[band]["channel"] = channel
-                            self.channel_config[band]["bandwidth"] = htmode
-                            print(f"[WIFI CONFIG] {band}: CH{channel} {htmode}")
-                    except Exception as e:
-                        print(f"[WIFI CONFIG] Parse error for {band}: {e}")
+            for band, (channel, htmode) in self._read_radio_configs().items():
+                if channel > 0:
+                    with self._config_lock:
+                        self.channel_config[band]["channel"] = channel
+                        self.channel_config[band]["bandwidth"] = htmode
+                        self._config_version += 1
+                    print(f"[WIFI CONFIG] {band}: CH{channel} {htmode}")
         
         # Return the current channel_config
         return dict(self.channel_config)
@@ -974,18 +1255,9 @@ class CaptureManager:
             
             if success and stdout.strip():
                 # 尋找 "Channel:XX" 或 "Channel XX" 格式
-                import re
-                patterns = [
-                    r'Channel[:\s]+(\d+)',
-                    r'channel[:\s]+(\d+)',
-                ]
-                for pattern in patterns:
-                    match = re.search(pattern, stdout, re.IGNORECASE)
-                    if match:
-                        try:
-                            return int(match.group(1))
-                        except ValueError:
-                            pass
+                match = _CHANNEL_RE.search(stdout)
+                if match:
+                    return int(match.group(1))
             
             return None
         except Exception as e:
@@ -1113,6 +1385,11 @@ class CaptureManager:
 capture_manager = CaptureManager()
 
 
+def get_capture_manager() -> CaptureManager:
+    """Return the shared CaptureManager instance"""
+    return capture_manager
+
+
 # Convenience functions
 def start_capture(band: str, auto_sync_time: bool = True) -> Tuple[bool, str]:
     return capture_manager.start_capture(band, auto_sync_time)
@@ -1122,6 +1399,10 @@ def stop_capture(band: str) -> Tuple[bool, str, Optional[str]]:
     return capture_manager.stop_capture(band)
 
 
+def start_all_captures() -> Dict[str, Dict[str, Any]]:
+    return capture_manager.start_all_captures()
+
+
 def stop_all_captures() -> Dict[str, Dict[str, Any]]:
     return capture_manager.stop_all_captures()
 
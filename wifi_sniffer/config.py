@@ -37,6 +37,10 @@ SERVER_PORT = int(os.environ.get('FLASK_PORT', 5000))
 SERVER_HOST = '0.0.0.0'
 DEBUG_MODE = True
 
+# ============== Response Compression ==============
+GZIP_MIN_SIZE = 256  # bytes; smaller JSON bodies are sent uncompressed
+GZIP_LEVEL = 4
+
 # ============== Channel Configuration ==============
 CHANNELS = {
     "2G": list(range(1, 15)),  # Channels 1-14
@@ -54,6 +58,10 @@ BANDWIDTHS = {
 CONNECTION_CACHE_TTL = 10  # seconds (increased from 5 for Win10 performance)
 INTERFACE_CACHE_TTL = 300  # 5 minutes
 STATUS_UPDATE_INTERVAL = 3  # seconds
+STATUS_SNAPSHOT_TTL = 0.25  # seconds a capture status snapshot is reused
+STATUS_FLUSH_DELAY = 0.05  # seconds status_update broadcasts are coalesced over
+STATUS_MIN_EMIT_INTERVAL = 0.5  # seconds between status_update emits (max 2/s)
+STATUS_TICK_INTERVAL = 1  # seconds between pushes while a capture runs (duration ticks)
 
 # ============== Monitor Configuration ==============
 MONITOR_INTERVAL = 5  # seconds between packet count checks (increased from 3 for Win10)
@@ -63,3 +71,8 @@ MONITOR_ERROR_THRESHOLD = 3  # consecutive failures before logging error
 SSH_POOL_SIZE = 3
 SSH_CONNECT_TIMEOUT = 10  # seconds
 SSH_COMMAND_TIMEOUT = 30  # seconds
+SSH_KEEPALIVE_INTERVAL = 15  # seconds between keepalives on idle pooled connections
+SFTP_WINDOW_SIZE = 2 ** 27  # 128MB receive window for pcap downloads
+SFTP_MAX_PACKET_SIZE = 2 ** 19  # 512KB (peer still caps at its own limit)
+DOWNLOAD_BUFFER_SIZE = 256 * 1024  # bytes per read/write when saving pcap downloads
+SSH_PROBE_CACHE_FILE = str(Path.home() / ".wifi_sniffer_cache.json")  # ssh option probe results
@@ -4,9 +4,14 @@ API Routes
 REST API endpoints for the WiFi Sniffer application.
 """
 
-import subprocess
+import gzip
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
 from pathlib import Path
-from flask import jsonify, request
+from types import MappingProxyType
+from flask import current_app, jsonify, request
 
 from . import api_bp
 from ..capture import capture_manager
@@ -14,40 +19,137 @@ from ..ssh import ssh_pool
 from ..cache import (
     status_cache, 
     get_cached_connection_status, 
-    set_cached_connection_status,
     get_cached_interface_mapping,
-    set_cached_interface_mapping
+    set_cached_interface_mapping,
+    get_cached_time_info,
+    set_cached_time_info,
+    TIME_INFO_FRESH
 )
 from ..config import (
     OPENWRT_HOST, OPENWRT_USER, OPENWRT_PASSWORD,
-    SSH_KEY_PATH, SSH_PORT, CHANNELS, BANDWIDTHS
+    SSH_KEY_PATH, SSH_PORT, CHANNELS, BANDWIDTHS, GZIP_MIN_SIZE, GZIP_LEVEL
 )
-from .. import perform_startup_cleanup, is_startup_cleanup_done
+from .. import perform_startup_cleanup, is_startup_cleanup_done, is_socketio_enabled
+
+
+# URL segment for /start, /stop and /config: the router matches only these
+# bands (either case), so other values 404 without reaching the view
+_BAND_ARG = '<any("2G", "5G", "6G", "2g", "5g", "6g"):band>'
+
+# Config endpoints whose (larger, nested) JSON is gzipped for clients that accept it
+_GZIP_ENDPOINTS = frozenset({
+    'api.api_get_interface_mapping',
+    'api.api_get_wifi_config',
+    'api.api_get_channel_config',
+})
+
+# (state key, encoded body) of the last /api/status response
+_status_body = (None, b"")
+
+# (config_version, encoded uci_wifi_map) for _uci_wifi_map_json()
+_uci_map_fragment = (None, None)
+
+# (config key, encoded body, gzipped body or None) of the last
+# /api/interface_mapping response; the gzipped copy is made on first use
+_mapping_body = (None, b"", None)
+
+# /api/test_connection fields that only depend on config
+_CONNECTION_STATIC = MappingProxyType({
+    "host": OPENWRT_HOST,
+    "port": SSH_PORT,
+    "user": OPENWRT_USER,
+    "auth_method": "key" if SSH_KEY_PATH else ("password" if OPENWRT_PASSWORD else "default"),
+})
+
+# /api/diagnose fields that only depend on config
+_DIAGNOSE_STATIC = MappingProxyType({
+    "host": OPENWRT_HOST,
+    "port": SSH_PORT,
+    "user": OPENWRT_USER,
+    "password_set": bool(OPENWRT_PASSWORD),
+    "no_password_mode": not OPENWRT_PASSWORD,
+    "key_path": SSH_KEY_PATH,
+})
+
+_SSH_KEY_NAMES = ("id_rsa", "id_ed25519", "id_ecdsa", "id_dsa")
+
+# Held while a background /api/time_info refresh runs
+_time_info_refresh_lock = threading.Lock()
+# pc_time/openwrt_time format used by capture_manager.get_time_info()
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _uci_wifi_map_json():
+    """uci_wifi_map pre-encoded for jsonify(), re-encoded when config_version changes"""
+    global _uci_map_fragment
+    version = capture_manager.config_version
+    cached_version, fragment = _uci_map_fragment
+    if cached_version != version:
+        fragment = current_app.json.fragment(capture_manager.uci_wifi_map)
+        _uci_map_fragment = (version, fragment)
+    return fragment
+
+
+@api_bp.after_request
+def _gzip_response(response):
+    """Gzip _GZIP_ENDPOINTS responses of at least GZIP_MIN_SIZE bytes"""
+    if request.endpoint not in _GZIP_ENDPOINTS:
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    if (request.method != 'GET' or response.status_code != 200
+            or response.direct_passthrough or 'Content-Encoding' in response.headers
+            or 'gzip' not in request.accept_encodings):
+        return response
+    
+    body = response.get_data()
+    if len(body) >= GZIP_MIN_SIZE:
+        response.set_data(gzip.compress(body, GZIP_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
 
 
 @api_bp.route('/status')
 def get_status():
-    """Get capture status for all bands"""
-    return jsonify(capture_manager.get_all_status())
-
-
-@api_bp.route('/start/<band>', methods=['POST'])
+    """
+    Get capture status for all bands.
+    
+    The encoded body is reused until the capture state changes or, while a
+    capture runs, the next second starts (durations tick once a second).
+    """
+    global _status_body
+    key = (capture_manager.state_version,
+           int(time.time()) if capture_manager.any_running() else None)
+    cached_key, body = _status_body
+    if cached_key != key:
+        body = jsonify(capture_manager.get_all_status()).get_data()
+        _status_body = (key, body)
+    return current_app.response_class(body, mimetype=current_app.json.mimetype)
+
+
+@api_bp.route('/start/' + _BAND_ARG, methods=['POST'])
 def api_start(band):
     """Start capture for a specific band"""
     band = band.upper()
-    if band not in capture_manager.interfaces:
-        return jsonify({"success": False, "message": f"Invalid band: {band}"})
     
     success, message = capture_manager.start_capture(band)
     return jsonify({"success": success, "message": message})
 
 
-@api_bp.route('/stop/<band>', methods=['POST'])
+@api_bp.route('/stop/' + _BAND_ARG, methods=['POST'])
 def api_stop(band):
     """Stop capture for a specific band"""
     band = band.upper()
-    if band not in capture_manager.interfaces:
-        return jsonify({"success": False, "message": f"Invalid band: {band}"})
+    
+    if is_socketio_enabled():
+        # Downloads can take minutes; the result arrives as 'download_complete'
+        success, message, job_id = capture_manager.stop_capture_background(band)
+        return jsonify({
+            "success": success,
+            "message": message,
+            "status": "downloading" if success else "error",
+            "job_id": job_id
+        })
     
     success, message, path = capture_manager.stop_capture(band)
     return jsonify({"success": success, "message": message, "path": path})
@@ -56,10 +158,7 @@ def api_stop(band):
 @api_bp.route('/start_all', methods=['POST'])
 def api_start_all():
     """Start capture for all bands"""
-    results = {}
-    for band in ["2G", "5G", "6G"]:
-        success, message = capture_manager.start_capture(band)
-        results[band] = {"success": success, "message": message}
+    results = capture_manager.start_all_captures()
     return jsonify({"results": results})
 
 
@@ -70,12 +169,10 @@ def api_stop_all():
     return jsonify({"results": results})
 
 
-@api_bp.route('/config/<band>', methods=['POST'])
+@api_bp.route('/config/' + _BAND_ARG, methods=['POST'])
 def api_config(band):
     """Update channel config for a single band"""
     band = band.upper()
-    if band not in capture_manager.interfaces:
-        return jsonify({"success": False, "message": f"Invalid band: {band}"})
     
     data = request.get_json()
     channel = int(data.get('channel', capture_manager.channel_config[band]['channel']))
@@ -88,14 +185,14 @@ def api_config(band):
 @api_bp.route('/apply_config', methods=['POST'])
 def api_apply_config():
     """Apply all channel configurations to OpenWrt"""
-    # Check if any capture is running
-    status = capture_manager.get_all_status()
-    for band in ["2G", "5G", "6G"]:
-        if status[band]["running"]:
-            return jsonify({
-                "success": False,
-                "message": f"Cannot apply config while {band} capture is running. Stop all captures first."
-            })
+    # Check if any capture is running (reads the status snapshot, no
+    # formatting or SSH)
+    running = capture_manager.running_bands()
+    if running:
+        return jsonify({
+            "success": False,
+            "message": f"Cannot apply config while {running[0]} capture is running. Stop all captures first."
+        })
     
     results = capture_manager.apply_all_and_restart_wifi()
     
@@ -116,7 +213,7 @@ def api_get_wifi_config():
     return jsonify({
         "success": True, 
         "config": config,
-        "uci_wifi_map": capture_manager.uci_wifi_map
+        "uci_wifi_map": _uci_wifi_map_json()
     })
 
 
@@ -126,10 +223,27 @@ def api_get_channel_config():
     return jsonify({
         "success": True,
         "config": capture_manager.channel_config,
-        "uci_wifi_map": capture_manager.uci_wifi_map
+        "uci_wifi_map": _uci_wifi_map_json()
     })
 
 
+def _probe_connection() -> bool:
+    """Test the SSH connection and run first-connect setup if it succeeds"""
+    connected = ssh_pool.test_connection()
+    
+    if connected:
+        # Perform startup cleanup on first successful connection
+        if not is_startup_cleanup_done():
+            perform_startup_cleanup()
+        
+        # Auto-detect interfaces if connected and not yet detected
+        if not capture_manager.detection_status["detected"]:
+            capture_manager.detect_interfaces()
+            set_cached_interface_mapping(capture_manager.interfaces)
+    
+    return connected
+
+
 @api_bp.route('/test_connection')
 def api_test_connection():
     """Test SSH connection to OpenWrt (with caching)"""
@@ -138,26 +252,12 @@ def api_test_connection():
     if cached_status is not None:
         connected = cached_status
     else:
-        # Perform actual test and cache result
-        connected = ssh_pool.test_connection()
-        set_cached_connection_status(connected)
-        
-        if connected:
-            # Perform startup cleanup on first successful connection
-            if not is_startup_cleanup_done():
-                perform_startup_cleanup()
-            
-            # Auto-detect interfaces if connected and not yet detected
-            if not capture_manager.detection_status["detected"]:
-                capture_manager.detect_interfaces()
-                set_cached_interface_mapping(capture_manager.interfaces)
+        # Concurrent misses share one probe instead of each opening SSH
+        connected = status_cache.get_or_compute('connection_status', _probe_connection)
     
     return jsonify({
         "connected": connected,
-        "host": OPENWRT_HOST,
-        "port": SSH_PORT,
-        "user": OPENWRT_USER,
-        "auth_method": "key" if SSH_KEY_PATH else ("password" if OPENWRT_PASSWORD else "default"),
+        **_CONNECTION_STATIC,
         "error": capture_manager.last_connection_error if not connected else None,
         "cached": cached_status is not None
     })
@@ -165,24 +265,17 @@ def api_test_connection():
 
 @api_bp.route('/diagnose')
 def api_diagnose():
-    """Diagnostic endpoint for troubleshooting"""
-    import sys
+    """Diagnostic endpoint for troubleshooting (results cached for 5 seconds)"""
+    cached_results = status_cache.get('diagnose')
+    if cached_results is not None:
+        return jsonify(cached_results)
     
-    # Check for SSH keys
+    # Check for SSH keys (per call, so a newly created key shows up)
     ssh_dir = Path.home() / ".ssh"
-    ssh_keys_found = []
-    for key_name in ["id_rsa", "id_ed25519", "id_ecdsa", "id_dsa"]:
-        key_path = ssh_dir / key_name
-        if key_path.exists():
-            ssh_keys_found.append(key_name)
+    ssh_keys_found = [name for name in _SSH_KEY_NAMES if (ssh_dir / name).exists()]
     
     results = {
-        "host": OPENWRT_HOST,
-        "port": SSH_PORT,
-        "user": OPENWRT_USER,
-        "password_set": OPENWRT_PASSWORD is not None and OPENWRT_PASSWORD != "",
-        "no_password_mode": OPENWRT_PASSWORD is None or OPENWRT_PASSWORD == "",
-        "key_path": SSH_KEY_PATH,
+        **_DIAGNOSE_STATIC,
         "ssh_keys_found": ssh_keys_found,
         "has_ssh_key": len(ssh_keys_found) > 0,
         "ping_test": False,
@@ -191,28 +284,18 @@ def api_diagnose():
         "solution": None
     }
     
-    # Get startupinfo for Windows
-    startupinfo = None
-    if sys.platform == "win32":
-        startupinfo = subprocess.STARTUPINFO()
-        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        startupinfo.wShowWindow = 0
-    
-    # Test ping
+    # Test reachability with a TCP connect to the SSH port (no ping process)
     try:
-        ping_result = subprocess.run(
-            ["ping", "-n", "1", "-w", "2000", OPENWRT_HOST],
-            capture_output=True,
-            timeout=5,
-            startupinfo=startupinfo
-        )
-        results["ping_test"] = ping_result.returncode == 0
-    except Exception as e:
+        probe = socket.create_connection((OPENWRT_HOST, SSH_PORT), timeout=1.0)
+        probe.close()
+        results["ping_test"] = True
+    except OSError as e:
         results["ping_error"] = str(e)
     
-    # Test SSH connection
-    results["ssh_test"] = ssh_pool.test_connection()
-    results["error"] = capture_manager.last_connection_error
+    # Test SSH connection, unless the port is not even reachable
+    if results["ping_test"]:
+        results["ssh_test"] = ssh_pool.test_connection()
+        results["error"] = capture_manager.last_connection_error
     
     # Provide solutions
     if not results["ping_test"]:
@@ -222,31 +305,73 @@ def api_diagnose():
         results["solution"] = "ssh_failed"
         results["solution_text"] = "SSH connection failed. Check: 1) SSH/Dropbear is enabled on OpenWrt, 2) Try: ssh root@192.168.1.1 in terminal"
     
+    status_cache.set('diagnose', results)
+    
     return jsonify(results)
 
 
+def _fetch_time_info() -> dict:
+    """Read PC/OpenWrt time over SSH and cache the result"""
+    info = capture_manager.get_time_info()
+    info["last_sync"] = capture_manager.last_sync_str
+    set_cached_time_info(info)
+    return info
+
+
+def _refresh_time_info():
+    """Background refresh for api_time_info (holds _time_info_refresh_lock)"""
+    try:
+        _fetch_time_info()
+    except Exception as e:
+        print(f"[TIME] Background refresh failed: {e}")
+    finally:
+        _time_info_refresh_lock.release()
+
+
+def _aged_time_info(info: dict, age: float) -> dict:
+    """
+    Bring cached time info up to now.
+    
+    Args:
+        info: Cached result of _fetch_time_info()
+        age: Seconds since it was fetched
+    
+    Returns:
+        Copy with pc_time read now and openwrt_time advanced by age; the
+        offset, synced flag and last_sync are served as cached
+    """
+    info = dict(info)
+    info["pc_time"] = datetime.now().strftime(TIME_FORMAT)
+    if info.get("openwrt_time", "Unknown") != "Unknown":
+        openwrt_time = datetime.strptime(info["openwrt_time"], TIME_FORMAT)
+        info["openwrt_time"] = (openwrt_time + timedelta(seconds=round(age))).strftime(TIME_FORMAT)
+    return info
+
+
 @api_bp.route('/time_info')
 def api_time_info():
-    """Get time information from PC and OpenWrt (with caching)"""
-    # Use cache for time info to reduce SSH calls
-    cached_info = status_cache.get('time_info')
-    if cached_info is not None:
-        return jsonify(cached_info)
+    """
+    Get time information from PC and OpenWrt (with caching).
     
-    info = capture_manager.get_time_info()
-    info["last_sync"] = capture_manager.time_sync_status["last_sync"].strftime("%Y-%m-%d %H:%M:%S") if capture_manager.time_sync_status["last_sync"] else None
+    Once the cached value is older than TIME_INFO_FRESH it is still served,
+    while a single background refresh fetches a new one, so no request
+    waits on the SSH round-trip unless the cache is empty. Clock readings
+    in a cached value are advanced to the time of the request.
+    """
+    cached_info, age = get_cached_time_info()
+    if cached_info is None:
+        return jsonify(_fetch_time_info())
     
-    # Cache for 2 seconds
-    status_cache.set('time_info', info, ttl=2)
-    
-    return jsonify(info)
+    if age >= TIME_INFO_FRESH and _time_info_refresh_lock.acquire(blocking=False):
+        threading.Thread(target=_refresh_time_info, daemon=True).start()
+    return jsonify(_aged_time_info(cached_info, age))
 
 
 @api_bp.route('/sync_time', methods=['POST'])
 def api_sync_time():
     """Manually sync OpenWrt time with PC time"""
     success, message = capture_manager.sync_time()
-    info = capture_manager.get_time_info()
+    info = _fetch_time_info()
     return jsonify({
         "success": success,
         "message": message,
@@ -257,9 +382,10 @@ def api_sync_time():
 @api_bp.route('/file_split', methods=['GET'])
 def api_get_file_split():
     """Get current file split configuration"""
+    config = capture_manager.file_split_config
     return jsonify({
-        "enabled": capture_manager.file_split_config["enabled"],
-        "size_mb": capture_manager.file_split_config["size_mb"]
+        "enabled": config["enabled"],
+        "size_mb": config["size_mb"]
     })
 
 
@@ -267,30 +393,34 @@ def api_get_file_split():
 def api_set_file_split():
     """Update file split configuration"""
     data = request.get_json()
+    config = capture_manager.file_split_config
     
     if "enabled" in data:
-        capture_manager.file_split_config["enabled"] = bool(data["enabled"])
+        config["enabled"] = bool(data["enabled"])
     
     if "size_mb" in data:
-        size = int(data["size_mb"])
-        if size < 10:
-            size = 10
-        elif size > 2000:
-            size = 2000
-        capture_manager.file_split_config["size_mb"] = size
+        # Clamp to 10MB..2000MB
+        config["size_mb"] = min(max(int(data["size_mb"]), 10), 2000)
     
+    enabled = config["enabled"]
+    size_mb = config["size_mb"]
     return jsonify({
         "success": True,
-        "enabled": capture_manager.file_split_config["enabled"],
-        "size_mb": capture_manager.file_split_config["size_mb"],
-        "message": f"File split {'enabled' if capture_manager.file_split_config['enabled'] else 'disabled'}" +
-                   (f" ({capture_manager.file_split_config['size_mb']}MB per file)" if capture_manager.file_split_config['enabled'] else "")
+        "enabled": enabled,
+        "size_mb": size_mb,
+        "message": f"File split enabled ({size_mb}MB per file)" if enabled else "File split disabled"
     })
 
 
 @api_bp.route('/interface_mapping')
 def api_get_interface_mapping():
-    """Get current interface mapping and detection status (with caching)"""
+    """
+    Get current interface mapping and detection status (with caching).
+    
+    The encoded body, and its gzipped form, are reused until the manager's
+    config_version changes (or the cached mapping comes and goes).
+    """
+    global _mapping_body
     # Check cache first
     cached_mapping = get_cached_interface_mapping()
     if cached_mapping is not None:
@@ -298,25 +428,47 @@ def api_get_interface_mapping():
     else:
         interfaces = capture_manager.interfaces
     
-    return jsonify({
-        "interfaces": interfaces,
-        "uci_wifi_map": capture_manager.uci_wifi_map,
-        "channel_config": capture_manager.channel_config,
-        "detection_status": {
-            "detected": capture_manager.detection_status["detected"],
-            "last_detection": capture_manager.detection_status["last_detection"].strftime("%Y-%m-%d %H:%M:%S") if capture_manager.detection_status["last_detection"] else None,
-            "detection_method": capture_manager.detection_status["detection_method"],
-            "detected_mapping": capture_manager.detection_status["detected_mapping"]
-        },
-        "cached": cached_mapping is not None
-    })
+    def build():
+        return jsonify({
+            "interfaces": interfaces,
+            "uci_wifi_map": _uci_wifi_map_json(),
+            "channel_config": capture_manager.channel_config,
+            "detection_status": {
+                "detected": capture_manager.detection_status["detected"],
+                "last_detection": capture_manager.last_detection_str,
+                "detection_method": capture_manager.detection_status["detection_method"],
+                "detected_mapping": capture_manager.detection_status["detected_mapping"]
+            },
+            "cached": cached_mapping is not None
+        })
+    
+    # A shared-backend mapping is a fresh copy each time, so only the
+    # manager's own dict can be keyed on the config version
+    if interfaces is not capture_manager.interfaces:
+        return build()
+    
+    key = (capture_manager.config_version, cached_mapping is not None)
+    cached_key, body, gz_body = _mapping_body
+    if cached_key != key:
+        body, gz_body = build().get_data(), None
+    
+    response = current_app.response_class(body, mimetype=current_app.json.mimetype)
+    if len(body) >= GZIP_MIN_SIZE and 'gzip' in request.accept_encodings:
+        # Compress once per config change; _gzip_response skips responses
+        # that already carry a Content-Encoding
+        if gz_body is None:
+            gz_body = gzip.compress(body, GZIP_LEVEL)
+        response.set_data(gz_body)
+        response.headers['Content-Encoding'] = 'gzip'
+    _mapping_body = (key, body, gz_body)
+    return response
 
 
 @api_bp.route('/detect_interfaces', methods=['POST'])
 def api_detect_interfaces():
     """Force re-detection of interface mapping"""
     # Reset detection status
-    capture_manager.detection_status["detected"] = False
+    capture_manager.reset_detection()
     
     # Run detection
     success = capture_manager.detect_interfaces()
@@ -324,10 +476,10 @@ def api_detect_interfaces():
     return jsonify({
         "success": success,
         "interfaces": capture_manager.interfaces,
-        "uci_wifi_map": capture_manager.uci_wifi_map,
+        "uci_wifi_map": _uci_wifi_map_json(),
         "detection_status": {
             "detected": capture_manager.detection_status["detected"],
-            "last_detection": capture_manager.detection_status["last_detection"].strftime("%Y-%m-%d %H:%M:%S") if capture_manager.detection_status["last_detection"] else None,
+            "last_detection": capture_manager.last_detection_str,
             "detection_method": capture_manager.detection_status["detection_method"]
         },
         "message": f"Detection {'successful' if success else 'failed'}. Mapping: 2G={capture_manager.interfaces.get('2G')}, 5G={capture_manager.interfaces.get('5G')}, 6G={capture_manager.interfaces.get('6G')}"
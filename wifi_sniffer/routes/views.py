@@ -25,7 +25,7 @@ def index():
     detection_status = {
         "detected": capture_manager.detection_status["detected"],
         "method": capture_manager.detection_status["detection_method"],
-        "last_detection": capture_manager.detection_status["last_detection"].strftime("%Y-%m-%d %H:%M:%S") if capture_manager.detection_status["last_detection"] else None
+        "last_detection": capture_manager.last_detection_str
     }
     
     # Return page immediately - connection status fetched via AJAX
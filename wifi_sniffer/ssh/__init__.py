@@ -5,12 +5,18 @@ SSH connection management and command execution.
 """
 
 from .connection import SSHConnectionPool, ssh_pool
-from .commands import run_ssh_command, run_ssh_command_background, download_file_scp
+from .commands import (
+    run_ssh_command, run_ssh_batch, run_ssh_command_background, run_ssh_stream,
+    download_file_scp, download_files
+)
 
 __all__ = [
     'SSHConnectionPool',
     'ssh_pool',
     'run_ssh_command',
+    'run_ssh_batch',
     'run_ssh_command_background',
-    'download_file_scp'
+    'run_ssh_stream',
+    'download_file_scp',
+    'download_files'
 ]
@@ -4,10 +4,13 @@ SSH Commands
 High-level SSH command functions using the connection pool.
 """
 
-from typing import Tuple, Optional
+from typing import Iterator, List, Tuple, Optional
 import subprocess
 from .connection import ssh_pool
 
+# Printed (with the exit status) after each command of a run_ssh_batch() script
+_BATCH_SEP = "__WIFI_SNIFFER_BATCH__"
+
 
 def run_ssh_command(command: str, timeout: int = 30) -> Tuple[bool, str, str]:
     """
@@ -23,6 +26,39 @@ def run_ssh_command(command: str, timeout: int = 30) -> Tuple[bool, str, str]:
     return ssh_pool.execute(command, timeout)
 
 
+def run_ssh_batch(commands: List[str], timeout: int = 30) -> List[Tuple[bool, str]]:
+    """
+    Run several SSH commands in one round-trip.
+    
+    The commands run one after another in a single remote shell, each
+    followed by a separator line carrying its exit status, so a failing
+    command doesn't stop the ones after it.
+    
+    Args:
+        commands: Commands to execute on OpenWrt, in order
+        timeout: Timeout for the whole batch in seconds
+        
+    Returns:
+        Per-command (success, stdout), in order; commands that never
+        reported back (SSH failure, timeout) get (False, "")
+    """
+    # $? is expanded before printf runs; the leading \n keeps the separator
+    # on its own line even if the command's output has no trailing newline
+    script = "".join(f"{cmd}\nprintf '\\n%s%s\\n' {_BATCH_SEP} $?\n" for cmd in commands)
+    _, stdout, _ = ssh_pool.execute(script, timeout)
+    
+    results = []
+    chunks = stdout.split("\n" + _BATCH_SEP)
+    output = chunks[0]
+    for chunk in chunks[1:]:
+        status, _, rest = chunk.partition("\n")
+        results.append((status.strip() == "0", output))
+        output = rest
+    
+    results.extend([(False, "")] * (len(commands) - len(results)))
+    return results[:len(commands)]
+
+
 def run_ssh_command_background(command: str) -> Optional[subprocess.Popen]:
     """
     Start SSH command in background.
@@ -36,10 +72,27 @@ def run_ssh_command_background(command: str) -> Optional[subprocess.Popen]:
     return ssh_pool.execute_background(command)
 
 
+def run_ssh_stream(command: str, idle_timeout: int = 30) -> Iterator[str]:
+    """
+    Run a long-lived SSH command and iterate over its output lines.
+    
+    Args:
+        command: Command to execute on OpenWrt
+        idle_timeout: Seconds without output before the stream gives up
+        
+    Returns:
+        Generator of output lines; close it to end the remote command
+    """
+    return ssh_pool.stream_lines(command, idle_timeout)
+
+
 def download_file_scp(remote_path: str, local_path: str) -> bool:
     """
     Download file from OpenWrt using SSH.
     
+    Uses SFTP when available, copying in DOWNLOAD_BUFFER_SIZE chunks
+    (config.py), otherwise an SSH cat pipe.
+    
     Args:
         remote_path: Path on OpenWrt
         local_path: Local destination path
@@ -50,6 +103,19 @@ def download_file_scp(remote_path: str, local_path: str) -> bool:
     return ssh_pool.download_file(remote_path, local_path)
 
 
+def download_files(files: List[Tuple[str, str]]) -> List[bool]:
+    """
+    Download several files from OpenWrt over one SFTP session.
+    
+    Args:
+        files: List of (remote_path, local_path)
+        
+    Returns:
+        Per-file success flags, in order
+    """
+    return ssh_pool.download_files(files)
+
+
 def test_ssh_connection() -> bool:
     """
     Test SSH connection to OpenWrt.
@@ -2,31 +2,96 @@
 SSH Connection Pool
 ===================
 Reusable SSH connection pool for improved performance.
-Caches SSH executable path and provides connection reuse.
+Keeps a pool of paramiko clients open across calls and falls back to
+the system SSH executable (cached path, ControlMaster reuse) when
+paramiko is unavailable or cannot connect.
 """
 
+import json
 import os
+import re
 import sys
 import subprocess
 import threading
 import queue
 import shutil
-from typing import Optional, Tuple
+import socket
+import tempfile
+import time
+from typing import Iterator, List, Optional, Tuple
+
+try:
+    import paramiko
+except ImportError:
+    paramiko = None
+
 from ..config import (
     OPENWRT_HOST, OPENWRT_USER, OPENWRT_PASSWORD,
     SSH_KEY_PATH, SSH_PORT, SSH_POOL_SIZE,
-    SSH_CONNECT_TIMEOUT, SSH_COMMAND_TIMEOUT
+    SSH_CONNECT_TIMEOUT, SSH_COMMAND_TIMEOUT, SSH_KEEPALIVE_INTERVAL,
+    CONNECTION_CACHE_TTL,
+    SFTP_WINDOW_SIZE, SFTP_MAX_PACKET_SIZE, SSH_PROBE_CACHE_FILE,
+    DOWNLOAD_BUFFER_SIZE
+)
+
+
+# Common Windows SSH locations, checked when ssh is not in PATH
+_SSH_FALLBACK_PATHS = (
+    r"C:\Windows\System32\OpenSSH\ssh.exe",
+    r"C:\Program Files\OpenSSH\ssh.exe",
+    r"C:\Program Files (x86)\OpenSSH\ssh.exe",
+    rf"C:\Users\{os.environ.get('USERNAME', '')}\AppData\Local\Microsoft\WindowsApps\ssh.exe",
 )
 
 
+def _pump_lines(stream, lines: "queue.Queue") -> None:
+    """Copy stream's lines into a queue, then None at EOF (reader thread)"""
+    try:
+        for line in stream:
+            lines.put(line)
+    except (OSError, ValueError):
+        pass
+    finally:
+        lines.put(None)
+        stream.close()
+
+
+def _load_probe_cache() -> dict:
+    """Load persisted SSH probe results (empty dict if missing/corrupt)"""
+    try:
+        with open(SSH_PROBE_CACHE_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_probe_cache(data: dict):
+    """Persist SSH probe results atomically (temp file + os.replace)"""
+    tmp_path = f"{SSH_PROBE_CACHE_FILE}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, SSH_PROBE_CACHE_FILE)
+    except OSError as e:
+        print(f"[SSH Pool] Could not write probe cache: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
 class SSHConnectionPool:
     """
     SSH Connection Pool for efficient command execution.
     
     Features:
+    - Pool of persistent paramiko clients (SSH_POOL_SIZE)
+    - Falls back to system SSH if paramiko cannot connect
     - Caches SSH executable path (found once)
     - Thread-safe command execution
     - Configurable timeout and options
+    - OpenSSH connection multiplexing (ControlMaster) where supported
     """
     
     _instance = None
@@ -47,50 +112,122 @@ class SSHConnectionPool:
             
         self._ssh_exe: Optional[str] = None
         self._pubkey_option: Optional[str] = None
+        self._probe_cache: dict = {}  # SSH_PROBE_CACHE_FILE contents
         self._startupinfo = None
+        self._popen_kwargs: dict = {}  # spread into every subprocess call
+        self._ssh_cmd_base: list = []  # constant argv prefix, see _build_ssh_command
         self._command_lock = threading.Lock()
+        self._control_path: Optional[str] = None
+        self._master_started = False
+        self._master_retry_at = 0.0
+        
+        # Paramiko client pool (filled lazily)
+        self._pool: "queue.Queue" = queue.Queue(maxsize=SSH_POOL_SIZE)
+        self._pool_lock = threading.Lock()
+        self._pool_created = 0
+        self._paramiko_retry_at = 0.0
+        
+        # Last connection test result: (monotonic timestamp, connected)
+        self._conn_cache: Tuple[float, bool] = (0.0, False)
+        self._conn_cache_lock = threading.Lock()
+        self._last_connected: Optional[bool] = None  # survives cache invalidation
         
-        # Initialize on first use
-        self._find_ssh_executable()
-        self._detect_pubkey_option()
-        self._setup_startupinfo()
+        # System SSH setup (executable lookup, probes) is deferred to
+        # _ensure_ready() so importing the pool never spawns processes
+        self._system_ready = False
         
         self._initialized = True
+    
+    def _ensure_ready(self):
+        """Initialize system SSH settings on first use (thread-safe, once)"""
+        if self._system_ready:
+            return
+        
+        with self._command_lock:
+            if self._system_ready:
+                return
+            self._setup_startupinfo()
+            self._probe_cache = _load_probe_cache()
+            self._find_ssh_executable()
+            self._detect_pubkey_option()
+            self._setup_control_path()
+            self._setup_ssh_cmd_base()
+            self._system_ready = True
+        
         print(f"[SSH Pool] Initialized with SSH: {self._ssh_exe}")
     
     def _find_ssh_executable(self) -> str:
-        """Find and cache SSH executable path (only once)"""
+        """Find and cache SSH executable path (only once, persisted to disk)"""
         if self._ssh_exe:
             return self._ssh_exe
-            
-        # Try to find ssh in PATH first
+        
+        # Path chosen by a previous launch: one stat instead of a search
+        cached = self._probe_cache.get("ssh_exe")
+        if cached and os.path.exists(cached):
+            self._ssh_exe = cached
+            return self._ssh_exe
+        
+        # Try to find ssh in PATH first, then common Windows SSH locations
         ssh_path = shutil.which("ssh")
+        if not ssh_path:
+            ssh_path = next((path for path in _SSH_FALLBACK_PATHS if os.path.exists(path)), None)
+        
         if ssh_path:
             self._ssh_exe = ssh_path
+            self._probe_cache["ssh_exe"] = ssh_path
+            _save_probe_cache(self._probe_cache)
             return self._ssh_exe
         
-        # Common Windows SSH locations
-        possible_paths = [
-            r"C:\Windows\System32\OpenSSH\ssh.exe",
-            r"C:\Program Files\OpenSSH\ssh.exe",
-            r"C:\Program Files (x86)\OpenSSH\ssh.exe",
-            rf"C:\Users\{os.environ.get('USERNAME', '')}\AppData\Local\Microsoft\WindowsApps\ssh.exe",
-        ]
-        
-        for path in possible_paths:
-            if os.path.exists(path):
-                self._ssh_exe = path
-                return self._ssh_exe
-        
         # Fallback to just "ssh"
         self._ssh_exe = "ssh"
         return self._ssh_exe
     
     def _detect_pubkey_option(self):
-        """Detect which pubkey option is supported (cached)"""
+        """
+        Detect which pubkey option is supported (cached).
+        
+        The result is persisted in SSH_PROBE_CACHE_FILE keyed by the ssh
+        executable path and mtime, so the probe runs once per ssh install.
+        """
         if self._pubkey_option is not None:
             return
-            
+        
+        try:
+            exe_path = shutil.which(self._ssh_exe) or self._ssh_exe
+            cache_key = f"{exe_path}|{os.path.getmtime(exe_path)}"
+        except OSError:
+            cache_key = None
+        
+        cache = self._probe_cache
+        entry = cache.get("pubkey_option", {})
+        if cache_key and entry.get("key") == cache_key:
+            self._pubkey_option = entry.get("value")
+            return
+        
+        self._pubkey_option = self._probe_pubkey_option()
+        
+        if cache_key:
+            cache["pubkey_option"] = {"key": cache_key, "value": self._pubkey_option}
+            _save_probe_cache(cache)
+    
+    def _probe_pubkey_option(self) -> Optional[str]:
+        """Ask the ssh executable which pubkey option name it accepts"""
+        # OpenSSH 8.5 renamed PubkeyAcceptedKeyTypes; the version banner
+        # is enough to decide without trying each option
+        try:
+            version = subprocess.run(
+                [self._ssh_exe, "-V"],
+                capture_output=True,
+                text=True,
+                timeout=5,
+                **self._popen_kwargs,
+            )
+            match = re.search(r"OpenSSH_\w*?(\d+)\.(\d+)", version.stderr or version.stdout)
+            if match and (int(match.group(1)), int(match.group(2))) >= (8, 5):
+                return "PubkeyAcceptedAlgorithms"
+        except Exception:
+            pass
+        
         for opt in ("PubkeyAcceptedAlgorithms", "PubkeyAcceptedKeyTypes"):
             try:
                 probe = subprocess.run(
@@ -98,15 +235,14 @@ class SSHConnectionPool:
                     capture_output=True,
                     text=True,
                     timeout=5,
-                    startupinfo=self._startupinfo,
+                    **self._popen_kwargs,
                 )
                 if probe.returncode == 0:
-                    self._pubkey_option = opt
-                    return
+                    return opt
             except Exception:
                 continue
         
-        self._pubkey_option = None
+        return None
     
     def _setup_startupinfo(self):
         """Setup Windows-specific startupinfo to hide console"""
@@ -114,21 +250,83 @@ class SSHConnectionPool:
             self._startupinfo = subprocess.STARTUPINFO()
             self._startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
             self._startupinfo.wShowWindow = 0  # SW_HIDE
+            self._popen_kwargs = {
+                'startupinfo': self._startupinfo,
+                'creationflags': subprocess.CREATE_NO_WINDOW,
+            }
     
-    def _build_ssh_command(self, timeout: Optional[int] = None, 
-                          batch_mode: bool = False) -> list:
-        """Build SSH command with cached executable"""
+    def _setup_control_path(self):
+        """
+        Setup ControlPath for OpenSSH connection multiplexing.
+        
+        Windows OpenSSH does not support ControlMaster (no Unix domain
+        sockets), so multiplexing is only enabled on POSIX systems.
+        """
+        if sys.platform == "win32":
+            self._control_path = None
+            return
+        self._control_path = os.path.join(tempfile.gettempdir(), "ssh-%r@%h:%p")
+    
+    def _ensure_master(self):
+        """
+        Start the shared master connection once.
+        
+        Serialized by _command_lock so only one thread sets up the master;
+        commands themselves are dispatched without holding the lock and
+        piggyback on the master through ControlPath.
+        """
+        if not self._control_path or self._master_started:
+            return
+        if time.monotonic() < self._master_retry_at:
+            return
+        
+        with self._command_lock:
+            if self._master_started or time.monotonic() < self._master_retry_at:
+                return
+            
+            master_cmd = self._build_ssh_command(timeout=SSH_CONNECT_TIMEOUT, batch_mode=True)
+            master_cmd[1:1] = [
+                "-M", "-N", "-f", "-o", "ControlPersist=600",
+                "-o", f"ServerAliveInterval={SSH_KEEPALIVE_INTERVAL}",
+            ]
+            try:
+                # The forked master keeps any inherited pipes open, so stdio
+                # must not be captured or run() would wait for ControlPersist
+                result = subprocess.run(
+                    master_cmd,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=SSH_CONNECT_TIMEOUT + 5,
+                    **self._popen_kwargs,
+                )
+                if result.returncode == 0:
+                    self._master_started = True
+                    print("[SSH Pool] Master connection established")
+                else:
+                    print(f"[SSH Pool] Master connection failed (exit {result.returncode})")
+            except Exception as e:
+                print(f"[SSH Pool] Master connection error: {e}")
+            
+            if not self._master_started:
+                # Commands still work without a master, retry later
+                self._master_retry_at = time.monotonic() + 30
+    
+    def _setup_ssh_cmd_base(self):
+        """Build the argv prefix shared by every system SSH command"""
         ssh_cmd = [
             self._ssh_exe,
             "-o", "StrictHostKeyChecking=no",
             "-o", "HostKeyAlgorithms=+ssh-rsa",
         ]
         
-        if timeout is not None:
-            ssh_cmd += ["-o", f"ConnectTimeout={timeout}"]
-        
-        if batch_mode:
-            ssh_cmd += ["-o", "BatchMode=yes"]
+        if self._control_path:
+            # Reuse the master socket if present, otherwise connect directly.
+            # Only _ensure_master() creates masters (-M overrides this).
+            ssh_cmd += [
+                "-o", "ControlMaster=no",
+                "-o", f"ControlPath={self._control_path}",
+            ]
         
         if SSH_PORT != 22:
             ssh_cmd += ["-p", str(SSH_PORT)]
@@ -136,13 +334,169 @@ class SSHConnectionPool:
         if SSH_KEY_PATH:
             ssh_cmd += ["-i", SSH_KEY_PATH]
         
-        ssh_cmd += [f"{OPENWRT_USER}@{OPENWRT_HOST}"]
+        self._ssh_cmd_base = ssh_cmd
+    
+    def _build_ssh_command(self, timeout: Optional[int] = None, 
+                          batch_mode: bool = False) -> list:
+        """Build SSH command from the cached argv prefix"""
+        ssh_cmd = list(self._ssh_cmd_base)
+        
+        if timeout is not None:
+            ssh_cmd += ["-o", f"ConnectTimeout={timeout}"]
+        
+        if batch_mode:
+            ssh_cmd += ["-o", "BatchMode=yes"]
+        
+        ssh_cmd.append(f"{OPENWRT_USER}@{OPENWRT_HOST}")
         return ssh_cmd
     
+    def _create_client(self):
+        """Open a new paramiko client to OpenWrt"""
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        
+        try:
+            client.connect(
+                OPENWRT_HOST,
+                port=SSH_PORT,
+                username=OPENWRT_USER,
+                password=OPENWRT_PASSWORD,
+                key_filename=SSH_KEY_PATH,
+                timeout=SSH_CONNECT_TIMEOUT,
+                banner_timeout=5,
+                # Same identities system ssh would offer: agent keys and
+                # ~/.ssh/id_* (what setup_ssh.bat installs)
+                allow_agent=True,
+                look_for_keys=True,
+            )
+        except paramiko.SSHException:
+            # OpenWrt default: root without password ("none" auth), which
+            # paramiko's connect() never attempts on its own. Only tried
+            # when no password is configured.
+            transport = client.get_transport()
+            if OPENWRT_PASSWORD or transport is None or not transport.is_active():
+                client.close()
+                raise
+            try:
+                transport.auth_none(OPENWRT_USER)
+            except Exception:
+                client.close()
+                raise
+        
+        # Keep idle pooled connections alive through NAT/router timeouts so the
+        # monitor poll never pays a reconnect
+        client.get_transport().set_keepalive(SSH_KEEPALIVE_INTERVAL)
+        return client
+    
+    def _checkout_client(self):
+        """
+        Get a client from the pool, opening a new one if the pool is not full.
+        
+        Returns:
+            paramiko.SSHClient or None if paramiko cannot be used
+        """
+        if paramiko is None or time.monotonic() < self._paramiko_retry_at:
+            return None
+        
+        deadline = time.monotonic() + SSH_CONNECT_TIMEOUT
+        while True:
+            while True:
+                try:
+                    client = self._pool.get_nowait()
+                except queue.Empty:
+                    break
+                if self._is_alive(client):
+                    return client
+                # Connection dropped while idle (e.g. router wifi restart)
+                self._discard_client(client)
+            
+            with self._pool_lock:
+                can_create = self._pool_created < SSH_POOL_SIZE
+                if can_create:
+                    self._pool_created += 1
+            if can_create:
+                break
+            
+            # Pool exhausted - wait for another thread to return a client
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                client = self._pool.get(timeout=remaining)
+            except queue.Empty:
+                return None
+            if self._is_alive(client):
+                return client
+            # Died while checked in; discarding frees its slot for a new one
+            self._discard_client(client)
+        
+        try:
+            client = self._create_client()
+            print(f"[SSH Pool] Opened paramiko connection to {OPENWRT_HOST}")
+            return client
+        except Exception as e:
+            with self._pool_lock:
+                self._pool_created -= 1
+            # Don't retry paramiko on every call while the router is unreachable
+            self._paramiko_retry_at = time.monotonic() + 30
+            print(f"[SSH Pool] Paramiko connection failed, using system SSH: {e}")
+            return None
+    
+    @staticmethod
+    def _is_alive(client) -> bool:
+        """True if the client's transport is still connected"""
+        transport = client.get_transport()
+        return transport is not None and transport.is_active()
+    
+    def _release_client(self, client):
+        """Return client to the pool if its transport is still alive"""
+        if not self._is_alive(client):
+            self._discard_client(client)
+        else:
+            self._checkin_client(client)
+    
+    def _checkin_client(self, client):
+        """Return a healthy client to the pool"""
+        try:
+            self._pool.put_nowait(client)
+        except queue.Full:
+            self._discard_client(client)
+    
+    def _discard_client(self, client):
+        """Close a broken client and free its pool slot"""
+        try:
+            client.close()
+        except Exception:
+            pass
+        with self._pool_lock:
+            self._pool_created = max(0, self._pool_created - 1)
+    
+    def _execute_paramiko(self, client, command: str, timeout: int) -> Tuple[bool, str, str]:
+        """Run command on a pooled paramiko client (client must be checked out)"""
+        try:
+            _, stdout, stderr = client.exec_command(command, timeout=timeout)
+            out = stdout.read().decode(errors="replace")
+            err = stderr.read().decode(errors="replace")
+            exit_status = stdout.channel.recv_exit_status()
+        except socket.timeout:
+            self._release_client(client)
+            self.invalidate_connection_cache()
+            return False, "", "Command timeout"
+        except Exception as e:
+            self._release_client(client)
+            self.invalidate_connection_cache()
+            return False, "", str(e)
+        
+        self._checkin_client(client)
+        return exit_status == 0, out, err
+    
     def execute(self, command: str, timeout: int = SSH_COMMAND_TIMEOUT) -> Tuple[bool, str, str]:
         """
         Execute SSH command with optimized settings.
         
+        Uses a pooled paramiko connection when available, otherwise
+        spawns the system SSH executable.
+        
         Args:
             command: Command to execute on remote host
             timeout: Command timeout in seconds
@@ -150,26 +504,89 @@ class SSHConnectionPool:
         Returns:
             Tuple of (success, stdout, stderr)
         """
+        client = self._checkout_client()
+        if client is not None:
+            return self._execute_paramiko(client, command, timeout)
+        return self._execute_system(command, timeout)
+    
+    def _execute_system(self, command: str, timeout: int,
+                        expect: Optional[str] = None) -> Tuple[bool, str, str]:
+        """
+        Execute command by spawning the system SSH executable.
+        
+        Args:
+            command: Command to execute on remote host
+            timeout: Command timeout in seconds
+            expect: If given, return success as soon as a stdout line
+                contains it instead of waiting for ssh to exit
+        """
+        self._ensure_ready()
+        self._ensure_master()
         ssh_cmd = self._build_ssh_command(timeout=SSH_CONNECT_TIMEOUT, batch_mode=False)
         ssh_cmd.append(command)
         
+        proc = None
+        lines = None
         try:
-            result = subprocess.run(
+            proc = subprocess.Popen(
                 ssh_cmd,
-                capture_output=True,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
                 text=True,
-                timeout=timeout + 5,
-                startupinfo=self._startupinfo,
+                **self._popen_kwargs,
             )
             
-            if result.returncode == 0:
-                return True, result.stdout, result.stderr
-            return False, result.stdout, result.stderr
+            if expect is not None:
+                # Lines arrive through a reader thread so the wait has a
+                # deadline; ConnectTimeout alone doesn't cover a stalled
+                # banner/auth or a host that never answers
+                lines = queue.Queue()
+                threading.Thread(
+                    target=_pump_lines, args=(proc.stdout, lines), daemon=True
+                ).start()
+                deadline = time.monotonic() + timeout + 5
+                while True:
+                    try:
+                        line = lines.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        raise subprocess.TimeoutExpired(ssh_cmd, timeout + 5)
+                    if line is None:
+                        break
+                    if expect in line:
+                        return True, line, ""
+                
+                # stdout hit EOF without the expected line
+                stderr = proc.stderr.read()
+                proc.wait(timeout=max(0.0, deadline - time.monotonic()))
+                if proc.returncode == 255:
+                    self.invalidate_connection_cache()
+                return False, "", stderr
+            
+            stdout, stderr = proc.communicate(timeout=timeout + 5)
+            
+            if proc.returncode == 0:
+                return True, stdout, stderr
+            if proc.returncode == 255:
+                # ssh itself failed (connection/auth error)
+                self.invalidate_connection_cache()
+            return False, stdout, stderr
             
         except subprocess.TimeoutExpired:
+            self.invalidate_connection_cache()
             return False, "", "Command timeout"
         except Exception as e:
+            self.invalidate_connection_cache()
             return False, "", str(e)
+        finally:
+            if proc is not None and proc.poll() is None:
+                proc.kill()
+                if lines is None:
+                    proc.communicate()
+                else:
+                    # The reader thread owns stdout; it exits at EOF
+                    proc.wait()
+                    proc.stderr.close()
     
     def execute_background(self, command: str) -> Optional[subprocess.Popen]:
         """
@@ -181,6 +598,8 @@ class SSHConnectionPool:
         Returns:
             Popen process object or None on failure
         """
+        self._ensure_ready()
+        self._ensure_master()
         ssh_cmd = self._build_ssh_command(timeout=SSH_CONNECT_TIMEOUT, batch_mode=False)
         ssh_cmd.append(command)
         
@@ -190,16 +609,75 @@ class SSHConnectionPool:
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 stdin=subprocess.DEVNULL,
-                startupinfo=self._startupinfo,
+                **self._popen_kwargs,
             )
             return process
         except Exception as e:
             print(f"[SSH] Failed to start background command: {e}")
             return None
     
+    def stream_lines(self, command: str,
+                     idle_timeout: int = SSH_COMMAND_TIMEOUT) -> Iterator[str]:
+        """
+        Run a long-lived command and yield its stdout line by line.
+        
+        Closing the generator closes the channel (or kills the ssh process),
+        which ends the remote command on its next write.
+        
+        Args:
+            command: Command to execute on remote host
+            idle_timeout: Seconds without output before the paramiko stream
+                raises socket.timeout
+            
+        Yields:
+            Output lines without the trailing newline
+        """
+        client = self._checkout_client()
+        if client is not None:
+            try:
+                chan = client.get_transport().open_session()
+            except Exception:
+                self._release_client(client)
+                self.invalidate_connection_cache()
+                raise
+            # Channels are multiplexed over the transport, so the client can
+            # serve other commands while this stream stays open
+            self._checkin_client(client)
+            try:
+                chan.settimeout(idle_timeout)
+                chan.exec_command(command)
+                for line in chan.makefile("r"):
+                    yield line.rstrip("\n")
+            finally:
+                chan.close()
+            return
+        
+        self._ensure_ready()
+        self._ensure_master()
+        ssh_cmd = self._build_ssh_command(timeout=SSH_CONNECT_TIMEOUT, batch_mode=True)
+        ssh_cmd.append(command)
+        proc = subprocess.Popen(
+            ssh_cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            stdin=subprocess.DEVNULL,
+            text=True,
+            **self._popen_kwargs,
+        )
+        try:
+            for line in proc.stdout:
+                yield line.rstrip("\n")
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+            proc.wait()
+    
     def download_file(self, remote_path: str, local_path: str) -> bool:
         """
-        Download file using SSH cat pipe.
+        Download file from remote host.
+        
+        Uses SFTP on a pooled paramiko connection when available, otherwise
+        falls back to an SSH cat pipe.
         
         Args:
             remote_path: Path on remote host
@@ -208,6 +686,81 @@ class SSHConnectionPool:
         Returns:
             True if download successful
         """
+        return self.download_files([(remote_path, local_path)])[0]
+    
+    def download_files(self, files: List[Tuple[str, str]]) -> List[bool]:
+        """
+        Download several files over a single SFTP session.
+        
+        Files SFTP cannot handle (no sftp-server, dropped transport) are
+        fetched with the SSH cat pipe instead.
+        
+        Args:
+            files: List of (remote_path, local_path)
+            
+        Returns:
+            Per-file success flags, in the same order as files
+        """
+        results: List[bool] = []
+        client = self._checkout_client()
+        if client is not None:
+            try:
+                # Large window so prefetch keeps the link busy instead of
+                # stalling on the default 2MB window
+                sftp = paramiko.SFTPClient.from_transport(
+                    client.get_transport(),
+                    window_size=SFTP_WINDOW_SIZE,
+                    max_packet_size=SFTP_MAX_PACKET_SIZE,
+                )
+            except Exception as e:
+                # Dropbear without sftp-server rejects the subsystem request
+                print(f"[SSH] SFTP unavailable, falling back to cat: {e}")
+                sftp = None
+            
+            if sftp is not None:
+                try:
+                    for remote_path, local_path in files:
+                        try:
+                            ok = self._sftp_get(sftp, remote_path, local_path)
+                        except OSError as e:
+                            if not client.get_transport().is_active():
+                                raise
+                            # File-level error (e.g. missing part), session still usable
+                            print(f"[SSH] SFTP download failed: {e}")
+                            ok = False
+                        results.append(ok)
+                except Exception as e:
+                    print(f"[SSH] SFTP download failed, falling back to cat: {e}")
+                finally:
+                    sftp.close()
+            self._release_client(client)
+        
+        for remote_path, local_path in files[len(results):]:
+            results.append(self._download_file_system(remote_path, local_path))
+        return results
+    
+    def _sftp_get(self, sftp, remote_path: str, local_path: str) -> bool:
+        """Fetch one file on an open SFTP session, checking its size"""
+        print(f"[SSH] Downloading {remote_path} to {local_path} (SFTP)")
+        with sftp.open(remote_path, 'rb') as remote_file:
+            expected = remote_file.stat().st_size
+            remote_file.prefetch(expected)
+            # getfo() copies in 32KB chunks; drain the prefetch buffer in
+            # DOWNLOAD_BUFFER_SIZE chunks instead
+            with open(local_path, 'wb', buffering=DOWNLOAD_BUFFER_SIZE) as f:
+                shutil.copyfileobj(remote_file, f, DOWNLOAD_BUFFER_SIZE)
+        
+        size = os.path.getsize(local_path)
+        if size < expected:
+            print(f"[SSH] Download incomplete: {size}/{expected} bytes")
+            return False
+        print(f"[SSH] Download success: {size} bytes")
+        return size > 0
+    
+    def _download_file_system(self, remote_path: str, local_path: str) -> bool:
+        """Download file using SSH cat pipe via the system SSH executable"""
+        self._ensure_ready()
+        self._ensure_master()
         ssh_cmd = self._build_ssh_command(timeout=SSH_CONNECT_TIMEOUT, batch_mode=False)
         ssh_cmd.append(f"cat {remote_path}")
         
@@ -220,7 +773,7 @@ class SSHConnectionPool:
                     stderr=subprocess.PIPE,
                     stdin=subprocess.DEVNULL,
                     timeout=120,
-                    startupinfo=self._startupinfo
+                    **self._popen_kwargs
                 )
             
             if result.returncode == 0 and os.path.exists(local_path):
@@ -235,9 +788,41 @@ class SSHConnectionPool:
             return False
     
     def test_connection(self) -> bool:
-        """Quick connection test"""
-        success, stdout, _ = self.execute("echo connected", timeout=10)
-        return success and "connected" in stdout
+        """
+        Quick connection test.
+        
+        Results are cached for CONNECTION_CACHE_TTL seconds so frequent
+        callers (status polling, WebSocket handlers) don't each open an
+        SSH session. Concurrent callers on a cache miss share one probe.
+        """
+        ts, connected = self._conn_cache
+        if time.monotonic() - ts < CONNECTION_CACHE_TTL:
+            return connected
+        
+        with self._conn_cache_lock:
+            # Another thread may have refreshed the result while we waited
+            ts, connected = self._conn_cache
+            if time.monotonic() - ts < CONNECTION_CACHE_TTL:
+                return connected
+            
+            client = self._checkout_client()
+            if client is not None:
+                success, stdout, _ = self._execute_paramiko(client, "echo connected", timeout=10)
+            else:
+                # Return on the first output line rather than ssh's exit
+                success, stdout, _ = self._execute_system("echo connected", 10, expect="connected")
+            connected = success and "connected" in stdout
+            self._conn_cache = (time.monotonic(), connected)
+            self._last_connected = connected
+            return connected
+    
+    def last_connection_state(self) -> Optional[bool]:
+        """Result of the most recent connection probe (None if never probed)"""
+        return self._last_connected
+    
+    def invalidate_connection_cache(self):
+        """Force the next test_connection() to probe the router"""
+        self._conn_cache = (0.0, False)
 
 
 # Global singleton instance
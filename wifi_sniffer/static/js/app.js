@@ -12,6 +12,7 @@ const STATUS_UPDATE_INTERVAL = 5000;
 let socket = null;
 let isConnected = false;
 let connectionCheckInterval = null;
+const statusState = {};  // Last known status per band (status_update sends deltas)
 
 // ============== WebSocket ==============
 function initWebSocket() {
@@ -39,7 +40,8 @@ function initWebSocket() {
     });
 
     socket.on('status_update', (data) => {
-        updateStatusDisplay(data);
+        // Broadcasts carry only changed fields; merge into the local copy
+        updateStatusDisplay(mergeStatus(data));
     });
 
     socket.on('connection_update', (data) => {
@@ -49,6 +51,12 @@ function initWebSocket() {
         }
     });
 
+    socket.on('download_complete', (data) => {
+        // Result of a background stop started by stopCapture()
+        showNotification(data.message, data.success ? 'success' : 'error');
+        refreshStatus();
+    });
+
     socket.on('connect_error', () => {
         console.log('[WS] Connection error, falling back to polling');
         startPolling();
@@ -62,7 +70,7 @@ function startPolling() {
         try {
             const response = await fetch('/api/status');
             const data = await response.json();
-            updateStatusDisplay(data);
+            updateStatusDisplay(mergeStatus(data));
         } catch (e) {
             console.error('[Polling] Status error:', e);
         }
@@ -254,6 +262,13 @@ async function redetectInterfaces() {
 }
 
 // ============== Status Updates ==============
+function mergeStatus(delta) {
+    for (const [band, fields] of Object.entries(delta)) {
+        statusState[band] = Object.assign(statusState[band] || {}, fields);
+    }
+    return statusState;
+}
+
 function updateStatusDisplay(data) {
     for (const [band, info] of Object.entries(data)) {
         const bandLower = band.toLowerCase();
@@ -313,7 +328,12 @@ async function stopCapture(band) {
     try {
         const response = await fetch('/api/stop/' + band, { method: 'POST' });
         const data = await response.json();
-        showNotification(data.message, data.success ? 'success' : 'error');
+        if (data.status === 'downloading') {
+            // Final result arrives via the 'download_complete' event
+            showNotification(data.message, 'info');
+        } else {
+            showNotification(data.message, data.success ? 'success' : 'error');
+        }
         if (data.success) {
             setTimeout(refreshStatus, 500);
         }
@@ -743,7 +763,7 @@ async function refreshStatus() {
     try {
         const response = await fetch('/api/status');
         const data = await response.json();
-        updateStatusDisplay(data);
+        updateStatusDisplay(mergeStatus(data));
     } catch (e) {
         console.error('[Status] Refresh error:', e);
     }
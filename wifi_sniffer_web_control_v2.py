@@ -14,6 +14,18 @@ Version: 2.0
 """
 
 import os
+
+# Opt-in event loop for SocketIO: the stdlib has to be patched before
+# anything else (Flask, sockets, threading users) is imported. Without it
+# the server runs in 'threading' mode.
+_ASYNC_MODE = os.environ.get('WIFI_SNIFFER_ASYNC_MODE')
+if _ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+elif _ASYNC_MODE == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
 import sys
 
 # Add wifi_sniffer package to path
@@ -27,23 +39,28 @@ from wifi_sniffer.capture import capture_manager
 
 def main():
     """Main entry point"""
-    print("=" * 60)
-    print("  WiFi Sniffer Web Control Panel v2.0")
-    print("=" * 60)
-    print(f"  OpenWrt Host: {OPENWRT_HOST}")
-    print(f"  Download Folder: {DOWNLOADS_FOLDER}")
-    print(f"  Default Interface Mapping:")
-    for band, iface in capture_manager.interfaces.items():
-        print(f"    - {band}: {iface}")
-    print("-" * 60)
-    print("  Performance Improvements in v2:")
-    print("  - SSH connection pooling")
-    print("  - Async page loading")
-    print("  - WebSocket real-time updates")
-    print("  - Cached interface detection")
-    print("=" * 60)
-    print(f"  Starting web server on http://127.0.0.1:{SERVER_PORT}")
-    print("=" * 60)
+    # Built up front and written in one go, so the banner is a single
+    # console write and can't interleave with other threads' output
+    banner = [
+        "=" * 60,
+        "  WiFi Sniffer Web Control Panel v2.0",
+        "=" * 60,
+        f"  OpenWrt Host: {OPENWRT_HOST}",
+        f"  Download Folder: {DOWNLOADS_FOLDER}",
+        "  Default Interface Mapping:",
+        *[f"    - {band}: {iface}" for band, iface in capture_manager.interfaces.items()],
+        "-" * 60,
+        "  Performance Improvements in v2:",
+        "  - SSH connection pooling",
+        "  - Async page loading",
+        "  - WebSocket real-time updates",
+        "  - Cached interface detection",
+        "=" * 60,
+        f"  Starting web server on http://127.0.0.1:{SERVER_PORT}",
+        "=" * 60,
+    ]
+    sys.stdout.write("\n".join(banner) + "\n")
+    sys.stdout.flush()
     
     # Create Flask app (this initializes socketio)
     app = create_app()
@@ -51,6 +68,11 @@ def main():
     # Access socketio from module after create_app has initialized it
     socketio = wifi_sniffer.socketio
     
+    if socketio is None:
+        # SocketIO could not be initialized; the UI falls back to polling
+        app.run(host=SERVER_HOST, port=SERVER_PORT, debug=False, use_reloader=False, threaded=True)
+        return
+    
     # Run with SocketIO support
     socketio.run(
         app,